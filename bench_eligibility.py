@@ -0,0 +1,133 @@
+"""
+bench_eligibility.py
+
+Benchmarks the promotion evaluators on synthetic careers and checks they agree:
+- scalar: promotion.try_promote per pilot (the original per-row path)
+- sql:    eligibility.fetch_eligible_pilots (one set-based query)
+- numpy:  eligibility.promote_ai_vectorized (column arrays)
+
+All pilots are evaluated as AI, so every path is deterministic and the resulting
+rank per pilot must be identical.
+
+Usage:  python bench_eligibility.py [--sizes 1000 10000 100000] [--seed 1]
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+
+import config
+import logger
+from promotion import try_promote
+from eligibility import fetch_eligible_pilots, load_pilot_arrays, promote_ai_vectorized, np
+
+THRESHOLDS = [
+    [210, 80,  0.10],
+    [260, 100, 0.10],
+    [310, 130, 0.10],
+    [370, 160, 0.075],
+    [430, 200, 0.075],
+    [500, 250, 0.075],
+    [580, 350, 0.07],
+    [680, 450, 0.06],
+    [800, 600, 0.05],
+]
+MAX_RANKS = {'101': 13, '102': 11, '103': 13, '201': 12}
+COUNTRIES = [101, 102, 103, 201]
+
+
+def build_career(n: int, seed: int) -> sqlite3.Connection:
+    """In-memory DB with the pilot/squadron columns the evaluators read."""
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE squadron (id INTEGER PRIMARY KEY, configID INTEGER, careerId INTEGER)")
+    conn.execute("""
+        CREATE TABLE pilot (
+            id INTEGER PRIMARY KEY, squadronId INTEGER, isDeleted INTEGER,
+            rankId INTEGER, pcp REAL, sorties INTEGER, goodSorties INTEGER
+        )
+    """)
+    squadrons = max(4, n // 50)
+    conn.executemany(
+        "INSERT INTO squadron VALUES (?, ?, 1)",
+        [(i, COUNTRIES[i % 4] * 1000 + i % 1000) for i in range(1, squadrons + 1)],
+    )
+    rows = []
+    for pid in range(1, n + 1):
+        s = rnd.randint(0, 700)
+        g = rnd.randint(int(s * 0.85), s) if s else 0
+        rows.append((pid, rnd.randint(1, squadrons), int(rnd.random() < 0.05),
+                     rnd.randint(1, 13), rnd.randint(0, 1000), s, g))
+    conn.executemany("INSERT INTO pilot VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    return conn
+
+
+def run_scalar(conn: sqlite3.Connection) -> dict:
+    """Original loop: country lookup + ceiling in Python, try_promote per pilot."""
+    country_map = {row[0]: row[1] // 1000 for row in conn.execute("SELECT id, configID FROM squadron")}
+    result = {}
+    for pid, rank, pcp, sorties, good, sq in conn.execute(
+        "SELECT id, rankId, pcp, sorties, goodSorties, squadronId FROM pilot WHERE isDeleted = 0 ORDER BY id"
+    ).fetchall():
+        max_rank_allowed = int(MAX_RANKS.get(str(country_map.get(sq, 201)), 13))
+        if rank < 4 or rank >= max_rank_allowed:
+            result[pid] = rank
+            continue
+        result[pid] = try_promote(conn, pid, rank, pcp, sorties, good, THRESHOLDS, "1942.01.01", is_player=False)
+    return result
+
+
+def run_sql(conn: sqlite3.Connection) -> dict:
+    ranks = dict(conn.execute("SELECT id, rankId FROM pilot WHERE isDeleted = 0"))
+    eligible, _ = fetch_eligible_pilots(conn, THRESHOLDS, MAX_RANKS)
+    for pid, rank, *_ in eligible:
+        ranks[pid] = rank + 1
+    return ranks
+
+
+def run_numpy(conn: sqlite3.Connection) -> dict:
+    arrays = load_pilot_arrays(conn)
+    new_ranks = promote_ai_vectorized(arrays, THRESHOLDS, MAX_RANKS)
+    return dict(zip(arrays["id"].tolist(), new_ranks.tolist()))
+
+
+def timed(fn, conn):
+    t0 = time.perf_counter()
+    out = fn(conn)
+    return out, (time.perf_counter() - t0) * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="bench_eligibility", description="Promotion evaluator benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    # keep per-pilot promotion lines out of the measurement
+    config.LOG_FILE = os.path.join(tempfile.gettempdir(), "bench_eligibility.log")
+    logger.configure({"LOG_LEVEL": "WARN"})
+
+    if np is None:
+        print("NumPy is not installed; the numpy column is skipped.")
+
+    print(f"{'pilots':>8} {'scalar ms':>10} {'sql ms':>9} {'numpy ms':>9}  match")
+    ok = True
+    for n in args.sizes:
+        conn = build_career(n, args.seed)
+        sql_res, sql_ms = timed(run_sql, conn)
+        np_res, np_ms = timed(run_numpy, conn) if np is not None else (sql_res, float("nan"))
+        scalar_res, scalar_ms = timed(run_scalar, conn)  # writes ranks, so it runs last
+        match = scalar_res == sql_res == np_res
+        ok = ok and match
+        print(f"{n:>8} {scalar_ms:>10.1f} {sql_ms:>9.1f} {np_ms:>9.1f}  {'yes' if match else 'NO'}")
+        conn.close()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
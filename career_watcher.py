@@ -0,0 +1,200 @@
+"""
+career_watcher.py
+
+Wakes the monitor loop as soon as the game writes cp.db / cp.db-wal in data/Career.
+
+Backends (picked by open_career_watcher):
+- InotifyBackend: Linux inotify via ctypes, filtered by file name
+- WindowsBackend: FindFirstChangeNotificationW on the Career directory; other files in
+  the directory (our own logs) also signal, so hits are confirmed by stat
+- StatPollBackend: portable fallback comparing (size, mtime) of the watched files
+
+wait(timeout) returns True on a change (after a debounce window so a burst of writes
+counts once) or False when the timeout elapses.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import ctypes
+import select
+import struct
+from typing import Iterable
+
+from config import WATCH_DEBOUNCE, WATCH_DEBOUNCE_MAX, WATCH_STAT_INTERVAL
+from db import _stat_signature
+from logger import log, debug
+
+WATCHED_FILES = ("cp.db", "cp.db-wal")
+
+
+class _Backend:
+    name = "base"
+
+    def __init__(self, career_dir: str, files: Iterable[str]):
+        self.career_dir = career_dir
+        self.files = tuple(files)
+        self.paths = tuple(os.path.join(career_dir, f) for f in self.files)
+        self._sig = self._signature()
+
+    def _signature(self):
+        return tuple(_stat_signature(p) for p in self.paths)
+
+    def _stat_changed(self) -> bool:
+        sig = self._signature()
+        if sig != self._sig:
+            self._sig = sig
+            return True
+        return False
+
+    def _wait_raw(self, timeout: float) -> bool:
+        """
+        Block up to timeout; True if a (possibly unrelated) change was signalled.
+        The base version sleeps one stat interval and lets _relevant() compare stats.
+        """
+        time.sleep(max(0.0, min(timeout, WATCH_STAT_INTERVAL)))
+        return True
+
+    def _relevant(self) -> bool:
+        """Whether the last raw signal concerned one of the watched files."""
+        return self._stat_changed()
+
+    def wait(self, timeout: float) -> bool:
+        deadline = time.monotonic() + max(0.0, timeout)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if self._wait_raw(remaining) and self._relevant():
+                break
+        # Debounce: swallow follow-up writes until quiet (bounded by WATCH_DEBOUNCE_MAX)
+        now = time.monotonic()
+        burst_end = now + WATCH_DEBOUNCE_MAX
+        quiet_at = now + WATCH_DEBOUNCE
+        while now < min(quiet_at, burst_end):
+            if self._wait_raw(min(quiet_at, burst_end) - now) and self._relevant():
+                quiet_at = time.monotonic() + WATCH_DEBOUNCE
+            now = time.monotonic()
+        self._sig = self._signature()
+        return True
+
+    def close(self) -> None:
+        pass
+
+
+class StatPollBackend(_Backend):
+    """Portable fallback: the base class's stat polling, nothing else."""
+    name = "stat"
+
+
+class InotifyBackend(_Backend):
+    name = "inotify"
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    _HEADER = struct.Struct("iIII")
+
+    def __init__(self, career_dir: str, files: Iterable[str]):
+        super().__init__(career_dir, files)
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE
+        if libc.inotify_add_watch(self._fd, os.fsencode(career_dir), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(err, "inotify_add_watch failed")
+        self._names = {os.fsencode(f) for f in self.files}
+        self._hit = False
+
+    def _wait_raw(self, timeout: float) -> bool:
+        ready, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+        if not ready:
+            return False
+        self._hit = False
+        try:
+            buf = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        pos = 0
+        while pos + self._HEADER.size <= len(buf):
+            _, _, _, length = self._HEADER.unpack_from(buf, pos)
+            pos += self._HEADER.size
+            name = buf[pos:pos + length].rstrip(b"\0")
+            pos += length
+            if name in self._names:
+                self._hit = True
+        return True
+
+    def _relevant(self) -> bool:
+        return self._hit
+
+    def close(self) -> None:
+        try:
+            os.close(self._fd)
+        except Exception:
+            pass
+
+
+class WindowsBackend(_Backend):
+    name = "win32"
+
+    FILE_NOTIFY_CHANGE_SIZE = 0x00000008
+    FILE_NOTIFY_CHANGE_LAST_WRITE = 0x00000010
+    WAIT_OBJECT_0 = 0x00000000
+    INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+
+    def __init__(self, career_dir: str, files: Iterable[str]):
+        super().__init__(career_dir, files)
+        k32 = ctypes.windll.kernel32
+        k32.FindFirstChangeNotificationW.restype = ctypes.c_void_p
+        k32.FindFirstChangeNotificationW.argtypes = [ctypes.c_wchar_p, ctypes.c_int, ctypes.c_uint32]
+        k32.FindNextChangeNotification.argtypes = [ctypes.c_void_p]
+        k32.FindCloseChangeNotification.argtypes = [ctypes.c_void_p]
+        k32.WaitForSingleObject.argtypes = [ctypes.c_void_p, ctypes.c_uint32]
+        k32.WaitForSingleObject.restype = ctypes.c_uint32
+        self._k32 = k32
+        self._handle = k32.FindFirstChangeNotificationW(
+            career_dir, False, self.FILE_NOTIFY_CHANGE_SIZE | self.FILE_NOTIFY_CHANGE_LAST_WRITE
+        )
+        if not self._handle or self._handle == self.INVALID_HANDLE_VALUE:
+            raise OSError("FindFirstChangeNotificationW failed")
+
+    def _wait_raw(self, timeout: float) -> bool:
+        rc = self._k32.WaitForSingleObject(self._handle, int(max(0.0, timeout) * 1000))
+        if rc != self.WAIT_OBJECT_0:
+            return False
+        self._k32.FindNextChangeNotification(self._handle)
+        return True
+
+    def close(self) -> None:
+        try:
+            self._k32.FindCloseChangeNotification(self._handle)
+        except Exception:
+            pass
+
+
+def open_career_watcher(db_path: str, files: Iterable[str] = WATCHED_FILES) -> _Backend:
+    """Best available backend for the directory holding db_path; falls back to stat polling."""
+    career_dir = os.path.dirname(os.path.abspath(db_path))
+    candidates = []
+    if sys.platform.startswith("linux"):
+        candidates.append(InotifyBackend)
+    elif os.name == "nt":
+        candidates.append(WindowsBackend)
+    for backend in candidates:
+        try:
+            watcher = backend(career_dir, files)
+            debug("[WATCH] Using %s watcher on %s", watcher.name, career_dir)
+            return watcher
+        except Exception as e:
+            log("[WATCH] %s watcher unavailable (%s); falling back to stat polling", backend.name, e)
+    return StatPollBackend(career_dir, files)
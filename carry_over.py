@@ -0,0 +1,83 @@
+"""
+carry_over.py
+
+Cached lookups for the player stats carry-over
+(rank_promotion_checker_light.migrate_player_stats_by_description_if_needed).
+
+Once a player's carry-over is done, later passes skip it without touching the database.
+The predecessor search uses an in-memory (description, name, lastName) map instead of
+scanning pilot on unindexed columns. The map is rebuilt only when PRAGMA data_version
+shows another connection committed; the mod's own writes never touch its key columns.
+"""
+
+from __future__ import annotations
+
+import bisect
+import sqlite3
+from typing import Dict
+
+
+def pilot_columns(conn: sqlite3.Connection) -> list[str]:
+    cur = conn.cursor()
+    return [row[1] for row in cur.execute("PRAGMA table_info(pilot)") if row and row[1]]
+
+
+class CarryOverCache:
+    """
+    Per-connection memo for migrate_player_stats_by_description_if_needed: the settled
+    player ids, the pilot column list and the predecessor map (keyed on data_version).
+    'unmatched' (no predecessor yet) only holds until the map is rebuilt.
+    """
+
+    def __init__(self):
+        self._conn = None
+        self.settled: set[int] = set()
+        self.unmatched: set[int] = set()
+        self._columns: list[str] | None = None
+        self._by_desc: Dict[tuple, list] = {}
+        self._keys: Dict[int, tuple] = {}
+        self._version = None
+
+    def bind(self, conn: sqlite3.Connection) -> None:
+        if conn is not self._conn:
+            self.invalidate()
+            self._conn = conn
+
+    def invalidate(self) -> None:
+        self._conn = None
+        self.settled, self.unmatched = set(), set()
+        self._columns = None
+        self._by_desc, self._keys, self._version = {}, {}, None
+
+    def is_settled(self, pid: int) -> bool:
+        return pid in self.settled or pid in self.unmatched
+
+    def pilot_columns(self, conn: sqlite3.Connection) -> list[str]:
+        if self._columns is None:
+            self._columns = pilot_columns(conn)
+        return self._columns
+
+    def previous_player(self, conn: sqlite3.Connection, new_pid: int) -> int | None:
+        """
+        Closest lower-id non-deleted pilot with the same description, name and lastName
+        (same answer as _find_previous_player_by_description), from the map.
+        """
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._version:
+            by_desc, keys = {}, {}
+            for pid, desc, name, last in conn.execute("""
+                SELECT id, description, name, lastName FROM pilot
+                WHERE isDeleted=0 AND description IS NOT NULL AND description <> ''
+                  AND name IS NOT NULL AND lastName IS NOT NULL
+                ORDER BY id
+            """):
+                keys[pid] = (desc, name, last)
+                by_desc.setdefault(keys[pid], []).append(pid)
+            self._by_desc, self._keys, self._version = by_desc, keys, version
+            self.unmatched = set()
+        key = self._keys.get(new_pid)
+        if key is None:
+            return None
+        ids = self._by_desc[key]
+        pos = bisect.bisect_left(ids, new_pid)
+        return ids[pos - 1] if pos > 0 else None
@@ -0,0 +1,152 @@
+"""
+checkpoint.py
+
+Durable monitor position: the last processed mission id, its in-game day and a
+fingerprint of that mission row, kept in the one-row rankmod.checkpoint table of the
+mod's sidecar database (state_db.py).
+
+The row is written inside the promotion pass transaction (apply_pass_writes), so after
+a restart the monitor resumes after the last mission whose pass committed. That
+transaction commits cp.db before the sidecar. The pilots it writes are journaled
+(rankmod.pass_journal) beforehand, so if only cp.db made it the pass runs again without
+promoting them twice for the same days (replayed_promotions).
+The fingerprint guards against a different career (or a rebuilt cp.db) reusing the
+same mission ids; a mismatch makes the monitor re-prime from the latest mission.
+
+A pass applied in chunks (apply_pass_writes) records its progress in rankmod.pass_cursor:
+the pass key (the checkpoint it ends at) and the highest pilot id already committed.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from helpers import normalize_mission_date
+from state_db import CHECKPOINT_TABLE, JOURNAL_TABLE, PASS_CURSOR_TABLE
+
+
+class Checkpoint(NamedTuple):
+    mission_id: int
+    date: Optional[str]         # canonical 'YYYY.MM.DD' of the last processed day
+    fingerprint: Optional[str]  # mission_fingerprint() of mission_id, None before the first mission
+
+
+def mission_fingerprint(date_str, squadron_id) -> str:
+    return f"{date_str}|{squadron_id}"
+
+
+def load_checkpoint(conn: sqlite3.Connection) -> Optional[Checkpoint]:
+    """Stored checkpoint, or None if there is none yet."""
+    row = conn.execute(
+        f"SELECT missionId, date, fingerprint FROM {CHECKPOINT_TABLE} WHERE id = 1"
+    ).fetchone()
+    return Checkpoint(int(row[0]), row[1], row[2]) if row else None
+
+
+def checkpoint_matches(conn: sqlite3.Connection, cp: Checkpoint) -> bool:
+    """Whether cp still points at the same mission row in this database."""
+    if cp.fingerprint is None:
+        # Saved before the first mission existed: valid while no mission precedes it
+        return conn.execute("SELECT 1 FROM mission WHERE id <= ? LIMIT 1", (cp.mission_id,)).fetchone() is None
+    row = conn.execute("SELECT date, squadronId FROM mission WHERE id = ?", (cp.mission_id,)).fetchone()
+    return row is not None and mission_fingerprint(row[0], row[1]) == cp.fingerprint
+
+
+def save_checkpoint(cur: sqlite3.Cursor, cp: Checkpoint) -> None:
+    """Upsert the checkpoint row; the caller owns the transaction."""
+    cur.execute(f"""
+        INSERT INTO {CHECKPOINT_TABLE} (id, missionId, date, fingerprint, updatedOn)
+        VALUES (1, ?, ?, ?, datetime('now'))
+        ON CONFLICT(id) DO UPDATE SET
+            missionId=excluded.missionId,
+            date=excluded.date,
+            fingerprint=excluded.fingerprint,
+            updatedOn=excluded.updatedOn
+    """, (cp.mission_id, cp.date, cp.fingerprint))
+
+
+def journal_pass(conn: sqlite3.Connection, pids: Iterable[int]) -> None:
+    """
+    Commit, on its own and before the pass transaction, the pilots whose rank the pass is
+    about to write plus the current last event rowid. Rows an unfinished pass left keep
+    their older rowid.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    try:
+        conn.executemany(
+            f"INSERT OR IGNORE INTO {JOURNAL_TABLE} (pilotId, eventRowid) "
+            f"VALUES (?, (SELECT IFNULL(MAX(rowid), 0) FROM main.event))",
+            [(pid,) for pid in pids],
+        )
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+
+
+def clear_pass_journal(cur: sqlite3.Cursor) -> None:
+    """Empty the journal; call inside the pass transaction."""
+    cur.execute(f"DELETE FROM {JOURNAL_TABLE}")
+
+
+def replayed_promotions(conn: sqlite3.Connection, days: Iterable[str]) -> Dict[int, str]:
+    """
+    pilot -> latest of 'days' on which an unfinished run of this pass already promoted it
+    (its cp.db half committed, the sidecar half did not). Only journaled pilots count, with
+    a type=6 event written after their journal row that gave them their current rank.
+    """
+    days = set(days)
+    replayed: Dict[int, str] = {}
+    for pid, event_date in conn.execute(f"""
+        SELECT e.pilotId, e.date FROM main.event e
+        JOIN {JOURNAL_TABLE} j ON j.pilotId = e.pilotId
+        JOIN main.pilot p ON p.id = e.pilotId
+        WHERE e.rowid > (SELECT MIN(eventRowid) FROM {JOURNAL_TABLE})
+          AND e.rowid > j.eventRowid
+          AND e.type = 6 AND e.missionId = -1
+          AND e.rankId > 4 AND e.rankId = p.rankId
+    """):
+        day = normalize_mission_date(str(event_date))
+        if day in days:
+            replayed[pid] = max(day, replayed.get(pid, day))
+    return replayed
+
+
+def pass_key(cp: Checkpoint) -> str:
+    return f"{cp.mission_id}|{cp.fingerprint}"
+
+
+def load_pass_cursor(conn: sqlite3.Connection, key: str) -> Optional[int]:
+    """Highest pilot id already committed by the pass 'key', or None."""
+    row = conn.execute(
+        f"SELECT lastPilotId FROM {PASS_CURSOR_TABLE} WHERE id = 1 AND passKey = ?", (key,)
+    ).fetchone()
+    return int(row[0]) if row else None
+
+
+def pending_pass_end(conn: sqlite3.Connection) -> Optional[int]:
+    """Mission id the partly applied pass ends at, or None if no pass is in progress."""
+    row = conn.execute(f"SELECT passKey FROM {PASS_CURSOR_TABLE} WHERE id = 1").fetchone()
+    if not row:
+        return None
+    try:
+        return int(str(row[0]).split("|", 1)[0])
+    except ValueError:
+        return None
+
+
+def save_pass_cursor(cur: sqlite3.Cursor, key: str, last_pilot_id: int) -> None:
+    """Upsert the pass cursor; the caller owns the transaction."""
+    cur.execute(
+        f"INSERT OR REPLACE INTO {PASS_CURSOR_TABLE} (id, passKey, lastPilotId) VALUES (1, ?, ?)",
+        (key, last_pilot_id),
+    )
+
+
+def clear_pass_cursor(cur: sqlite3.Cursor) -> None:
+    cur.execute(f"DELETE FROM {PASS_CURSOR_TABLE} WHERE id = 1")
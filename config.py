@@ -11,6 +11,21 @@ else:
 
 CONFIG_FILE       = "promotion_config.json"
 POLL_INTERVAL     = 5  # seconds
+PROCESS_SCAN_MAX_INTERVAL = 30  # seconds; backoff cap for the IL-2 process scan while the game is closed
+WATCH_IDLE_TIMEOUT  = 15    # seconds the monitor sleeps without cp.db activity before re-checking IL-2
+WATCH_DEBOUNCE      = 0.25  # seconds of quiet that end a burst of cp.db writes
+WATCH_DEBOUNCE_MAX  = 2.0   # upper bound on how long a burst is coalesced
+WATCH_STAT_INTERVAL = 1.0   # seconds between stat checks for the polling fallback
+WRITE_BUSY_TIMEOUT_MS = 250  # ms a pass write waits for IL-2's lock before backing off
+WRITE_RETRY_ATTEMPTS  = 5    # immediate tries per pass write before it is queued
+WRITE_RETRY_BASE      = 0.05 # seconds; first retry backoff, doubled per retry (jittered)
+WRITE_RETRY_MAX       = 5.0  # seconds; backoff cap, also for retrying queued writes
+PASS_CHUNK_ROWS  = 200   # pilots written per transaction when a pass is applied in chunks
+PASS_CHUNK_MS    = 50    # ms budget per chunk transaction; slower chunks halve the next chunk
+PASS_CHUNK_PAUSE = 0.01  # seconds between chunks so IL-2 can take the lock
+MAINT_ORPHANS_EVERY  = 24 * 3600      # seconds between orphan cleanups (only while IL-2 is closed)
+MAINT_OPTIMIZE_EVERY = 7 * 24 * 3600  # seconds between ANALYZE / PRAGMA optimize of the state db
+MAINT_MAX_RANK_EVERY = 3600           # seconds between personage.maxRank checks
 LOG_FILE          = "promotion_debug.log"
 LOCALE_MAP = {
     "RU": "rus", "CHS": "chs", "ENG": "eng", "DEU": "ger",
@@ -0,0 +1,394 @@
+"""
+db.py
+
+Long-lived connections to the IL-2 career database (cp.db).
+
+- reader(): read-only connection (URI mode=ro) used by the monitor loop for polling
+- writer(): read-write connection used only during promotion passes
+- Both are tuned with SQLITE_PRAGMAS from promotion_config.json and are re-opened
+  transparently when cp.db is replaced on disk (new file identity) or after reset().
+- on_writer_open (optional) runs on every newly opened writer, e.g. to attach the
+  mod's state database.
+- ChangeDetector: cheap "did anything commit since last tick?" check so the mission,
+  squadron and pilot queries only run after the game has written to cp.db.
+- EvaluationSnapshot (optional, SNAPSHOT_EVAL): private in-memory copy of the tables a
+  promotion pass reads, so eligibility and player resolution never hold a read lock
+  on cp.db longer than the copy itself.
+- BusyRetryWriter: runs pass writes with a short busy timeout; when IL-2 holds the lock
+  the write is retried with jittered backoff and, if still contended, queued
+  (WriteDeferred) until the monitor can retry it.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import random
+import sqlite3
+from collections import deque
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.request import pathname2url
+
+from config import WRITE_BUSY_TIMEOUT_MS, WRITE_RETRY_ATTEMPTS, WRITE_RETRY_BASE, WRITE_RETRY_MAX
+from logger import log, debug, warn
+
+# cache_size < 0 is KiB (SQLite convention); busy_timeout is ms
+DEFAULT_PRAGMAS: Dict[str, int] = {
+    "cache_size": -8000,
+    "mmap_size": 64 * 1024 * 1024,
+    "busy_timeout": 2000,
+}
+_ALLOWED_PRAGMAS = {"cache_size", "mmap_size", "busy_timeout", "temp_store"}
+
+
+def merge_pragmas(overrides: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    """Defaults + user overrides; unknown names and non-integer values are dropped."""
+    merged = dict(DEFAULT_PRAGMAS)
+    for name, value in (overrides or {}).items():
+        name = str(name).strip().lower()
+        if name not in _ALLOWED_PRAGMAS:
+            warn("Ignoring unsupported SQLite pragma %s", name)
+            continue
+        try:
+            merged[name] = int(value)
+        except (TypeError, ValueError):
+            warn("Ignoring non-integer value for pragma %s: %r", name, value)
+    return merged
+
+
+def _file_identity(path: str) -> Optional[Tuple]:
+    """(device, inode, creation time) — changes when the file is replaced, not when it is written."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    born = getattr(st, "st_birthtime", None)
+    if born is None and os.name == "nt":
+        born = st.st_ctime_ns  # creation time on Windows
+    return st.st_dev, st.st_ino, born
+
+
+class ConnectionManager:
+    def __init__(self, db_path: str, pragmas: Optional[Dict[str, Any]] = None,
+                 on_writer_open: Optional[Callable[[sqlite3.Connection], None]] = None):
+        self.db_path = db_path
+        self.pragmas = merge_pragmas(pragmas)
+        self.on_writer_open = on_writer_open
+        self._reader: Optional[sqlite3.Connection] = None
+        self._writer: Optional[sqlite3.Connection] = None
+        self._identity = None
+
+    def _apply_pragmas(self, conn: sqlite3.Connection) -> None:
+        for name, value in self.pragmas.items():
+            try:
+                conn.execute(f"PRAGMA {name}={int(value)}")
+            except sqlite3.DatabaseError as e:
+                warn("PRAGMA %s=%s failed: %s", name, value, e)
+
+    def _check_identity(self) -> None:
+        ident = _file_identity(self.db_path)
+        if self._identity is not None and ident != self._identity:
+            log("[DB] %s was replaced on disk; reopening connections", self.db_path)
+            self.close()
+        self._identity = ident
+
+    def reader(self) -> sqlite3.Connection:
+        self._check_identity()
+        if self._reader is None:
+            uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True)
+            self._apply_pragmas(conn)
+            self._reader = conn
+        return self._reader
+
+    def writer(self) -> sqlite3.Connection:
+        self._check_identity()
+        if self._writer is None:
+            conn = sqlite3.connect(self.db_path)
+            self._apply_pragmas(conn)
+            if self.on_writer_open is not None:
+                try:
+                    self.on_writer_open(conn)
+                except Exception:
+                    conn.close()
+                    raise
+            self._writer = conn
+        return self._writer
+
+    def reset(self) -> None:
+        """Drop both connections (rolling back any open write); they reopen on next use."""
+        self.close()
+
+    def close(self) -> None:
+        for conn in (self._reader, self._writer):
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+        self._reader = None
+        self._writer = None
+
+
+def _stat_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class ChangeDetector:
+    """
+    Reports whether cp.db may have changed since the previous call.
+
+    PRAGMA data_version on the persistent reader changes whenever another connection
+    commits; (size, mtime) of cp.db and cp.db-wal is checked as well, so a change seen
+    by either source counts. A different connection object resets the baseline.
+    """
+
+    def __init__(self, db_path: str):
+        self.paths = (db_path, db_path + "-wal")
+        self._conn = None
+        self._version = None
+        self._stats = None
+
+    def changed(self, conn: sqlite3.Connection) -> bool:
+        stats = tuple(_stat_signature(p) for p in self.paths)
+        try:
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.DatabaseError:
+            version = None
+
+        changed = (
+            conn is not self._conn
+            or version is None
+            or version != self._version
+            or stats != self._stats
+        )
+        self._conn, self._version, self._stats = conn, version, stats
+        return changed
+
+    def reset(self) -> None:
+        self._conn = self._version = self._stats = None
+
+
+# snapshot table -> (columns, copy query against the attached live cp.db). Columns are
+# untyped so values keep the storage class they have in cp.db.
+_SNAPSHOT_TABLES = {
+    "pilot": (
+        "id INTEGER PRIMARY KEY, squadronId, isDeleted, rankId, pcp, sorties, goodSorties, personageId",
+        "SELECT id, squadronId, isDeleted, rankId, pcp, sorties, goodSorties, personageId FROM live.pilot",
+    ),
+    "squadron": (
+        "id INTEGER PRIMARY KEY, configID, careerId",
+        "SELECT id, configID, careerId FROM live.squadron",
+    ),
+    "mission": (
+        "id INTEGER PRIMARY KEY, date, squadronId",
+        "SELECT id, date, squadronId FROM live.mission",
+    ),
+}
+
+# Who flew the squadron's latest mission, probed per player pilot the way
+# player_resolver does, so the copy never scans the event table
+_SNAPSHOT_EVENTS_SQL = """
+    INSERT INTO main.event (missionId, pilotId)
+    SELECT m.id, p.id
+    FROM (SELECT MAX(id) AS id FROM live.mission WHERE squadronId = :sq) m
+    JOIN live.pilot p ON p.personageId <> '' AND p.squadronId = :sq
+    WHERE EXISTS (SELECT 1 FROM live.event e WHERE e.missionId = m.id AND e.pilotId = p.id)
+"""
+
+_SNAPSHOT_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS snap_pilot_squadron ON pilot(squadronId)",
+    "CREATE INDEX IF NOT EXISTS snap_mission_squadron ON mission(squadronId, id)",
+    "CREATE INDEX IF NOT EXISTS snap_event_mission ON event(missionId, pilotId)",
+)
+
+
+class EvaluationSnapshot:
+    """
+    In-memory copy of pilot, squadron and mission plus who flew the given squadrons' latest
+    missions, re-copied from cp.db in one read transaction by refresh(). TEMP tables on it
+    (pilot fingerprints) live as long as the snapshot, which is rebuilt if cp.db is replaced.
+    """
+
+    def __init__(self, db_path: str, busy_timeout_ms: int = DEFAULT_PRAGMAS["busy_timeout"]):
+        self.db_path = db_path
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self.conn: Optional[sqlite3.Connection] = None
+        self._identity = None
+        self.last_copy_ms = 0.0
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(":memory:", uri=True)  # uri=True so ATTACH accepts mode=ro
+        conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+        for name, (columns, _) in _SNAPSHOT_TABLES.items():
+            conn.execute(f"CREATE TABLE {name} ({columns})")
+        conn.execute("CREATE TABLE event (missionId, pilotId)")
+        for sql in _SNAPSHOT_INDEXES:
+            conn.execute(sql)
+        conn.commit()
+        return conn
+
+    def refresh(self, squadron_ids=()) -> sqlite3.Connection:
+        """Re-copy the tables and the latest-mission events of squadron_ids; returns the snapshot."""
+        ident = _file_identity(self.db_path)
+        if self.conn is not None and ident != self._identity:
+            log("[DB] %s was replaced on disk; rebuilding the evaluation snapshot", self.db_path)
+            self.close()
+        if self.conn is None:
+            self.conn = self._open()
+            self._identity = ident
+        conn = self.conn
+        if conn.in_transaction:
+            conn.commit()
+        started = time.perf_counter()
+        uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+        conn.execute("ATTACH DATABASE ? AS live", (uri,))
+        try:
+            conn.execute("BEGIN")
+            for name, (_, select) in _SNAPSHOT_TABLES.items():
+                conn.execute(f"DELETE FROM main.{name}")
+                conn.execute(f"INSERT INTO main.{name} {select}")
+            conn.execute("DELETE FROM main.event")
+            conn.executemany(_SNAPSHOT_EVENTS_SQL, [{"sq": sq} for sq in sorted(set(squadron_ids))])
+            conn.commit()  # ends the read transaction on cp.db
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            conn.execute("DETACH DATABASE live")
+        self.last_copy_ms = (time.perf_counter() - started) * 1000.0
+        debug("[DB] Evaluation snapshot refreshed in %.1f ms", self.last_copy_ms)
+        return conn
+
+    def close(self) -> None:
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+        self.conn = None
+        self._identity = None
+
+
+_BUSY_CODES = {5, 6}  # SQLITE_BUSY, SQLITE_LOCKED
+
+
+def is_busy_error(exc: BaseException) -> bool:
+    """Whether exc is SQLite lock contention (as opposed to a real failure)."""
+    if not isinstance(exc, sqlite3.OperationalError):
+        return False
+    code = getattr(exc, "sqlite_errorcode", None)
+    if code is not None:
+        return (code & 0xFF) in _BUSY_CODES
+    msg = str(exc).lower()
+    return "locked" in msg or "busy" in msg
+
+
+class WriteDeferred(Exception):
+    """A write could not get the lock within its retry budget and was queued."""
+
+
+class BusyRetryWriter:
+    """
+    Runs write jobs (callables owning one short BEGIN IMMEDIATE … COMMIT) with a bounded
+    busy_timeout, retrying lock contention with jittered exponential backoff. A job still
+    busy after WRITE_RETRY_ATTEMPTS tries is queued (WriteDeferred); later jobs queue behind it.
+    """
+
+    def __init__(self,
+                 busy_timeout_ms: int = WRITE_BUSY_TIMEOUT_MS,
+                 attempts: int = WRITE_RETRY_ATTEMPTS,
+                 base_delay: float = WRITE_RETRY_BASE,
+                 max_delay: float = WRITE_RETRY_MAX,
+                 sleep: Callable[[float], None] = time.sleep,
+                 rng: Optional[random.Random] = None):
+        self.busy_timeout_ms = max(0, int(busy_timeout_ms))
+        self.attempts = max(1, int(attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.rng = rng or random.Random()  # own RNG: promotion rolls use the global one
+        self.pending = deque()  # (label, conn, job)
+        self.counters = {"writes": 0, "busy": 0, "retries": 0, "deferred": 0, "wait_ms": 0.0}
+        self._failures = 0
+        self._retry_at = 0.0
+
+    def _delay(self, n: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** n))
+        return delay * (0.5 + 0.5 * self.rng.random())
+
+    def _attempt(self, conn: sqlite3.Connection, job: Callable[[], Any]) -> bool:
+        # The short timeout is for this job only; the connection's other writes keep theirs
+        previous = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+        conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+        started = time.monotonic()
+        try:
+            job()
+        except Exception as e:
+            if not is_busy_error(e):
+                raise
+            self.counters["busy"] += 1
+            self.counters["wait_ms"] += (time.monotonic() - started) * 1000.0
+            return False
+        finally:
+            conn.execute(f"PRAGMA busy_timeout={int(previous)}")
+        self.counters["writes"] += 1
+        return True
+
+    def _defer(self, label: str, conn: sqlite3.Connection, job: Callable[[], Any]) -> None:
+        self.pending.append((label, conn, job))
+        self.counters["deferred"] += 1
+        if len(self.pending) == 1:
+            self._failures = 0
+            self._retry_at = time.monotonic() + self._delay(0)
+        warn("cp.db is busy; %s queued for retry (%d pending)", label, len(self.pending))
+        raise WriteDeferred(label)
+
+    def run(self, conn: sqlite3.Connection, job: Callable[[], Any], label: str = "write") -> None:
+        if self.pending:
+            self._defer(label, conn, job)
+        for n in range(self.attempts):
+            if self._attempt(conn, job):
+                return
+            if n + 1 < self.attempts:
+                delay = self._delay(n)
+                self.counters["retries"] += 1
+                self.counters["wait_ms"] += delay * 1000.0
+                debug("[DB] %s hit a busy cp.db; retry %d in %.0f ms", label, n + 1, delay * 1000.0)
+                self.sleep(delay)
+        self._defer(label, conn, job)
+
+    def retry_pending(self) -> bool:
+        """Retry queued jobs in order if their backoff has elapsed. True when the queue is empty."""
+        if not self.pending:
+            return True
+        if time.monotonic() < self._retry_at:
+            return False
+        while self.pending:
+            label, conn, job = self.pending[0]
+            self.counters["retries"] += 1
+            if not self._attempt(conn, job):
+                self._failures += 1
+                self._retry_at = time.monotonic() + self._delay(self._failures)
+                return False
+            self.pending.popleft()
+            log("[DB] Queued %s committed", label)
+        self._failures = 0
+        return True
+
+    def next_retry_in(self) -> float:
+        return max(0.0, self._retry_at - time.monotonic()) if self.pending else 0.0
+
+    def clear(self) -> None:
+        """Drop queued jobs (their connection is gone; the monitor re-derives them)."""
+        if self.pending:
+            warn("Dropping %d queued write(s); they will be recomputed", len(self.pending))
+        self.pending.clear()
+        self._failures = 0
@@ -0,0 +1,297 @@
+"""
+eligibility.py
+
+Set-based promotion eligibility: one SQL statement over the whole pilot table.
+
+thresholds and max_ranks are loaded into TEMP tables on the pass connection, and the
+query returns only pilots that
+  - are not deleted, rank >= 4 and below their country's ceiling, and
+  - meet thresholds[rank - 4]:  pcp >= pr OR (sorties >= sr AND failure <= fr)
+
+The rule mirrors promotion.try_promote, which still makes the final decision for the
+returned rows (player cooldown / roll).
+
+A NumPy evaluator computes the same selection from column arrays (and the AI
+auto-promotion outcome for bulk runs). Pick one with EVALUATOR in promotion_config.json:
+"sql" (default) or "numpy"; "numpy" falls back to "sql" when NumPy is not installed.
+
+Incremental passes: stage_changed_pilots copies into a TEMP table only the pilots whose
+(rankId, pcp, sorties, goodSorties, squadronId) differ from the fingerprint remembered
+after the previous pass, plus every player-linked pilot (personageId set), whose cooldown
+can expire without any stat changing. Both evaluators accept source=STAGED_PILOTS to read
+that table instead of pilot. A fresh connection has no fingerprints, so its first pass
+evaluates everyone.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from logger import log, warn
+from squadron_cache import DEFAULT_COUNTRY
+
+# Optional deps (safe if missing at runtime)
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+DEFAULT_MAX_RANK = 13
+
+# (id, rankId, pcp, sorties, goodSorties, squadronId)
+PilotRow = Tuple[int, int, float, int, int, int]
+
+PILOT_SOURCE = "pilot"
+STAGED_PILOTS = "temp.rankmod_pass_pilots"
+
+# {source} is filled in per call: PILOT_SOURCE or STAGED_PILOTS
+_MANAGED_FROM = f"""
+    FROM {{source}} p
+    LEFT JOIN squadron s ON s.id = p.squadronId
+    LEFT JOIN temp.rankmod_caps c ON c.country = COALESCE(s.configID / 1000, {DEFAULT_COUNTRY})
+    WHERE p.isDeleted = 0
+      AND p.rankId >= 4
+      AND p.rankId < COALESCE(c.max_rank, {DEFAULT_MAX_RANK})
+"""
+
+_ELIGIBLE_SQL = f"""
+    SELECT p.id, p.rankId, p.pcp, p.sorties, p.goodSorties, p.squadronId
+    {_MANAGED_FROM}
+      AND EXISTS (
+        SELECT 1 FROM temp.rankmod_thresholds t
+        WHERE t.step = p.rankId - 4
+          AND (
+            CAST(p.pcp AS REAL) >= t.pcp
+            OR (
+              CAST(p.sorties AS INTEGER) >= t.sorties
+              AND (CASE WHEN CAST(p.sorties AS INTEGER) > 0
+                        THEN (CAST(p.sorties AS INTEGER) - CAST(p.goodSorties AS INTEGER)) * 1.0
+                             / CAST(p.sorties AS INTEGER)
+                        ELSE 1.0 END) <= t.failure
+            )
+          )
+      )
+    ORDER BY p.id
+"""
+
+_SCANNED_SQL = f"SELECT COUNT(*) {_MANAGED_FROM}"
+
+
+def _managed_sql(template: str, source: str) -> str:
+    if source not in (PILOT_SOURCE, STAGED_PILOTS):
+        raise ValueError(f"unsupported pilot source: {source}")
+    return template.replace("{source}", source)
+
+
+def load_rule_tables(conn: sqlite3.Connection,
+                     thresholds: Sequence[Sequence[float]],
+                     max_ranks: Dict[str, int]) -> None:
+    """(Re)fill the per-connection TEMP tables holding thresholds and country ceilings."""
+    conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS rankmod_thresholds (
+            step INTEGER PRIMARY KEY,
+            pcp REAL,
+            sorties INTEGER,
+            failure REAL
+        )
+    """)
+    conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS rankmod_caps (
+            country INTEGER PRIMARY KEY,
+            max_rank INTEGER
+        )
+    """)
+    conn.execute("DELETE FROM temp.rankmod_thresholds")
+    conn.execute("DELETE FROM temp.rankmod_caps")
+    conn.executemany(
+        "INSERT INTO temp.rankmod_thresholds (step, pcp, sorties, failure) VALUES (?, ?, ?, ?)",
+        [(i, float(t[0]), t[1], float(t[2])) for i, t in enumerate(thresholds)],
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO temp.rankmod_caps (country, max_rank) VALUES (?, ?)",
+        [(int(k), int(v)) for k, v in max_ranks.items()],
+    )
+    conn.commit()  # end the implicit transaction so no lock is held on cp.db
+
+
+def fetch_eligible_pilots(conn: sqlite3.Connection,
+                          thresholds: Sequence[Sequence[float]],
+                          max_ranks: Dict[str, int],
+                          source: str = PILOT_SOURCE) -> Tuple[List[PilotRow], int]:
+    """
+    Returns (eligible pilot rows ordered by id, number of managed pilots scanned).
+    """
+    load_rule_tables(conn, thresholds, max_ranks)
+    rows = conn.execute(_managed_sql(_ELIGIBLE_SQL, source)).fetchall()
+    scanned = conn.execute(_managed_sql(_SCANNED_SQL, source)).fetchone()[0]
+    return rows, int(scanned or 0)
+
+
+# --- Pilot fingerprints (incremental passes) ---
+_FINGERPRINT_CHANGED = """
+    f.id IS NULL
+    OR f.rankId IS NOT p.rankId
+    OR f.pcp IS NOT p.pcp
+    OR f.sorties IS NOT p.sorties
+    OR f.goodSorties IS NOT p.goodSorties
+    OR f.squadronId IS NOT p.squadronId
+"""
+
+
+def stage_changed_pilots(conn: sqlite3.Connection) -> int:
+    """
+    Fill STAGED_PILOTS with the non-deleted pilots whose fingerprint changed since the
+    last remembered pass, plus all player-linked pilots. Returns the number staged.
+    """
+    conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS rankmod_pilot_fingerprints (
+            id INTEGER PRIMARY KEY,
+            rankId INTEGER,
+            pcp REAL,
+            sorties INTEGER,
+            goodSorties INTEGER,
+            squadronId INTEGER
+        )
+    """)
+    conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS rankmod_pass_pilots (
+            id INTEGER PRIMARY KEY,
+            isDeleted INTEGER,
+            rankId INTEGER,
+            pcp REAL,
+            sorties INTEGER,
+            goodSorties INTEGER,
+            squadronId INTEGER
+        )
+    """)
+    conn.execute(f"DELETE FROM {STAGED_PILOTS}")
+    cur = conn.execute(f"""
+        INSERT INTO {STAGED_PILOTS} (id, isDeleted, rankId, pcp, sorties, goodSorties, squadronId)
+        SELECT p.id, p.isDeleted, p.rankId, p.pcp, p.sorties, p.goodSorties, p.squadronId
+        FROM pilot p
+        LEFT JOIN temp.rankmod_pilot_fingerprints f ON f.id = p.id
+        WHERE p.isDeleted = 0
+          AND ({_FINGERPRINT_CHANGED} OR IFNULL(p.personageId, '') <> '')
+    """)
+    staged = cur.rowcount
+    conn.commit()  # TEMP-only writes; don't keep a transaction open on the connection
+    return max(0, staged)
+
+
+def remember_staged_pilots(cur: sqlite3.Cursor) -> None:
+    """
+    Record the staged rows as the new fingerprints. Call inside the pass transaction so
+    a rolled-back pass re-evaluates the same pilots next time.
+    """
+    cur.execute(f"""
+        INSERT OR REPLACE INTO temp.rankmod_pilot_fingerprints
+            (id, rankId, pcp, sorties, goodSorties, squadronId)
+        SELECT id, rankId, pcp, sorties, goodSorties, squadronId FROM {STAGED_PILOTS}
+    """)
+
+
+# --- Vectorized (NumPy) evaluator ---
+_COLUMNS_SQL = f"""
+    SELECT p.id,
+           IFNULL(p.rankId, 0),
+           IFNULL(CAST(p.pcp AS REAL), 0.0),
+           IFNULL(CAST(p.sorties AS INTEGER), 0),
+           IFNULL(CAST(p.goodSorties AS INTEGER), 0),
+           IFNULL(p.squadronId, -1),
+           COALESCE(s.configID / 1000, {DEFAULT_COUNTRY})
+    FROM {{source}} p
+    LEFT JOIN squadron s ON s.id = p.squadronId
+    WHERE p.isDeleted = 0
+    ORDER BY p.id
+"""
+
+
+def load_pilot_arrays(conn: sqlite3.Connection, source: str = PILOT_SOURCE) -> Dict[str, "np.ndarray"]:
+    """Read the non-deleted pilot columns into NumPy arrays (one query)."""
+    rows = conn.execute(_managed_sql(_COLUMNS_SQL, source)).fetchall()
+    cols = list(zip(*rows)) if rows else [()] * 7
+    return {
+        "id": np.asarray(cols[0], dtype=np.int64),
+        "rankId": np.asarray(cols[1], dtype=np.int64),
+        "pcp": np.asarray(cols[2], dtype=np.float64),
+        "sorties": np.asarray(cols[3], dtype=np.int64),
+        "goodSorties": np.asarray(cols[4], dtype=np.int64),
+        "squadronId": np.asarray(cols[5], dtype=np.int64),
+        "country": np.asarray(cols[6], dtype=np.int64),
+    }
+
+
+def evaluate_arrays(arrays: Dict[str, "np.ndarray"],
+                    thresholds: Sequence[Sequence[float]],
+                    max_ranks: Dict[str, int]) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Vectorized try_promote eligibility. Returns (eligible, managed) boolean masks, where
+    managed = rank >= 4 and below the country ceiling.
+    """
+    rank = arrays["rankId"]
+    pcp = arrays["pcp"]
+    sorties = arrays["sorties"]
+    good = arrays["goodSorties"]
+    country = arrays["country"]
+
+    cap = np.full(rank.shape, DEFAULT_MAX_RANK, dtype=np.int64)
+    for c, v in max_ranks.items():
+        cap[country == int(c)] = int(v)
+    managed = (rank >= 4) & (rank < cap)
+
+    table = np.asarray([[float(t[0]), float(t[1]), float(t[2])] for t in thresholds], dtype=np.float64)
+    if len(table) == 0:
+        return np.zeros(rank.shape, dtype=bool), managed
+    idx = rank - 4
+    has_step = (idx >= 0) & (idx < len(table))
+    step = table[np.clip(idx, 0, len(table) - 1)]
+    pr, sr, fr = step[:, 0], step[:, 1], step[:, 2]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        failure = np.where(sorties > 0, (sorties - good) / np.where(sorties > 0, sorties, 1), 1.0)
+
+    meets = (pcp >= pr) | ((sorties >= sr) & (failure <= fr))
+    return managed & has_step & meets, managed
+
+
+def promote_ai_vectorized(arrays: Dict[str, "np.ndarray"],
+                          thresholds: Sequence[Sequence[float]],
+                          max_ranks: Dict[str, int]) -> "np.ndarray":
+    """New rankId per pilot if every pilot were AI (one step for each eligible pilot)."""
+    eligible, _ = evaluate_arrays(arrays, thresholds, max_ranks)
+    return arrays["rankId"] + eligible.astype(np.int64)
+
+
+def fetch_eligible_pilots_numpy(conn: sqlite3.Connection,
+                                thresholds: Sequence[Sequence[float]],
+                                max_ranks: Dict[str, int],
+                                source: str = PILOT_SOURCE) -> Tuple[List[PilotRow], int]:
+    """Same contract as fetch_eligible_pilots, evaluated with NumPy."""
+    arrays = load_pilot_arrays(conn, source)
+    eligible, managed = evaluate_arrays(arrays, thresholds, max_ranks)
+    sel = np.flatnonzero(eligible)
+    rows = [
+        (int(arrays["id"][i]), int(arrays["rankId"][i]), float(arrays["pcp"][i]),
+         int(arrays["sorties"][i]), int(arrays["goodSorties"][i]), int(arrays["squadronId"][i]))
+        for i in sel
+    ]
+    return rows, int(managed.sum())
+
+
+EVALUATORS: Dict[str, Callable] = {
+    "sql": fetch_eligible_pilots,
+    "numpy": fetch_eligible_pilots_numpy,
+}
+
+
+def select_evaluator(name: str | None) -> Callable:
+    """Resolve the EVALUATOR config value; unknown names and a missing NumPy fall back to 'sql'."""
+    key = str(name or "sql").strip().lower()
+    if key not in EVALUATORS:
+        warn("Unknown EVALUATOR %r; using sql", name)
+        key = "sql"
+    if key == "numpy" and np is None:
+        warn("EVALUATOR=numpy but NumPy is not installed; using sql")
+        key = "sql"
+    return EVALUATORS[key]
@@ -0,0 +1,54 @@
+"""
+event_ledger.py
+
+De-duplication of type=6 promotion events through rankmod.promotion_event_ledger
+(state_db.py) instead of scanning the game's event table.
+
+The ledger is keyed by (pilotId, rankId, date) and WITHOUT ROWID, so a lookup is one
+primary-key probe; a hit is confirmed with a rowid probe into event, so a ledger row
+that outlived its event (cp.db replaced, event removed) does not block a new insert.
+Events whose ledger rows were lost with a sidecar commit (see checkpoint.py) are entered
+by the next pass from the pass journal (ledger_record_journaled).
+"""
+
+from __future__ import annotations
+
+import sqlite3
+
+from state_db import EVENT_LEDGER_TABLE, JOURNAL_TABLE
+
+
+def ledger_has_event(cur: sqlite3.Cursor, pilot_id: int, rank_id: int, date: str) -> bool:
+    row = cur.execute(
+        f"SELECT eventRowid FROM {EVENT_LEDGER_TABLE} WHERE pilotId=? AND rankId=? AND date=?",
+        (pilot_id, rank_id, date),
+    ).fetchone()
+    if row is None or row[0] is None:
+        return False
+    return cur.execute(
+        """
+        SELECT 1 FROM main.event
+        WHERE rowid=? AND type=6 AND pilotId=? AND rankId=? AND date=? AND missionId=-1
+        """,
+        (row[0], pilot_id, rank_id, date),
+    ).fetchone() is not None
+
+
+def ledger_record(cur: sqlite3.Cursor, pilot_id: int, rank_id: int, date: str, event_rowid: int) -> None:
+    """Remember an inserted event; the caller owns the transaction."""
+    cur.execute(
+        f"INSERT OR REPLACE INTO {EVENT_LEDGER_TABLE} (pilotId, rankId, date, eventRowid) VALUES (?, ?, ?, ?)",
+        (pilot_id, rank_id, date, event_rowid),
+    )
+
+
+def ledger_record_journaled(cur: sqlite3.Cursor) -> None:
+    """Enter the type=6 events written after each journaled pilot's journal row; call before clearing it."""
+    cur.execute(f"""
+        INSERT OR REPLACE INTO {EVENT_LEDGER_TABLE} (pilotId, rankId, date, eventRowid)
+        SELECT e.pilotId, e.rankId, e.date, e.rowid FROM main.event e
+        JOIN {JOURNAL_TABLE} j ON j.pilotId = e.pilotId
+        WHERE e.rowid > (SELECT MIN(eventRowid) FROM {JOURNAL_TABLE})
+          AND e.rowid > j.eventRowid
+          AND e.type = 6 AND e.missionId = -1 AND e.rankId IS NOT NULL AND e.date IS NOT NULL
+    """)
@@ -1,16 +1,23 @@
-import psutil
-from datetime import datetime
+from datetime import datetime, date
+from functools import lru_cache
 from logger import log
+from process_watcher import ProcessWatcher
+from state_db import ATTEMPTS_TABLE
+
+IL2_PROCESS_NAME = "il-2.exe"
+il2_watcher = ProcessWatcher(IL2_PROCESS_NAME)
 
 # --- Helpers ---
 def is_il2_running() -> bool:
-    for p in psutil.process_iter(("name",)):
-        try:
-            if p.info["name"] and p.info["name"].lower() == "il-2.exe":
-                return True
-        except Exception:
-            pass
-    return False
+    """Cheap once IL-2 has been found: the watcher only re-checks the pinned pid."""
+    return il2_watcher.is_running()
+
+def wait_for_il2(idle=None) -> int:
+    """
+    Block until IL-2 is running (full scans back off while it is closed); returns its pid.
+    idle (optional) is called between scans, i.e. only while IL-2 is not running.
+    """
+    return il2_watcher.wait_until_running(idle)
         
 def normalize_mission_date(date_str: str) -> str:
     """
@@ -35,11 +42,20 @@ def normalize_mission_date(date_str: str) -> str:
 
     return base
 
-def cleanup_orphaned_promotion_attempts(conn):
+@lru_cache(maxsize=256)
+def mission_day_ordinal(date_str: str) -> int:
+    """Proleptic Gregorian ordinal of a mission day (any format normalize_mission_date accepts)."""
+    base = normalize_mission_date(str(date_str))
+    return date(int(base[0:4]), int(base[5:7]), int(base[8:10])).toordinal()
+
+def cleanup_orphaned_promotion_attempts(conn) -> int:
+    """Delete attempt rows whose pilot no longer exists (one pilot PK probe per row)."""
     cur = conn.cursor()
-    cur.execute("""
-        DELETE FROM promotion_attempts
-        WHERE pilotId NOT IN (SELECT id FROM pilot)
+    cur.execute(f"""
+        DELETE FROM {ATTEMPTS_TABLE}
+        WHERE NOT EXISTS (SELECT 1 FROM main.pilot p WHERE p.id = promotion_attempts.pilotId)
     """)
+    removed = max(0, cur.rowcount)
     conn.commit()
-    log("[CLEANUP] Removed orphaned entries from promotion_attempts")
\ No newline at end of file
+    log("[CLEANUP] Removed %s orphaned entries from promotion_attempts", removed)
+    return removed
\ No newline at end of file
@@ -1,30 +1,345 @@
-#import os
+import os
+import re
+import json
 import time
+import queue
+import atexit
+import threading
 import config
 
-# --- Logging ---
-def trim_log_to_last_n_missions(path, n):
+MISSION_MARKER = "=== Mission Start:"
+KEEP_MISSIONS = 10           # missions retained across log segments
+MISSIONS_PER_SEGMENT = 1     # missions written to the active segment before it is sealed
+FLUSH_INTERVAL = 0.5         # seconds between forced flushes while records keep arriving
+BATCH_SIZE = 256             # max records written per drain
+JSONL_MAX_BYTES = 5_000_000  # JSONL sink is rolled over to <name>.jsonl.1 past this size
+
+# Levels (configured via LOG_LEVEL in promotion_config.json)
+DEBUG, INFO, WARN, ERROR = 10, 20, 30, 40
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARN: "WARN", ERROR: "ERROR"}
+_LEVEL_BY_NAME = {"DEBUG": DEBUG, "INFO": INFO, "WARN": WARN, "WARNING": WARN, "ERROR": ERROR}
+_TEXT_TAGS = {WARN: "[WARN] ", ERROR: "[ERROR] "}  # level tag in front of text log lines
+
+LOG_LEVEL = INFO
+JSONL_ENABLED = False
+
+_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+_writer = None
+_writer_lock = threading.Lock()
+_STOP = object()
+_MISSION_RE = re.compile(re.escape(MISSION_MARKER) + r"\s*(\S+)")
+
+
+def configure(cfg: dict) -> None:
     """
-    Keep only the last n missions in the log file at 'path'.
-    Silently ignores any errors.
+    Apply LOG_LEVEL ('DEBUG'|'INFO'|'WARN'|'ERROR') and LOG_JSONL (bool) from the config.
+    Safe to call multiple times.
     """
+    global LOG_LEVEL, JSONL_ENABLED
+    name = str(cfg.get("LOG_LEVEL", LEVEL_NAMES[LOG_LEVEL])).strip().upper()
+    LOG_LEVEL = _LEVEL_BY_NAME.get(name, LOG_LEVEL)
+    JSONL_ENABLED = bool(cfg.get("LOG_JSONL", JSONL_ENABLED))
+
+
+def jsonl_path_for(log_path: str) -> str:
+    stem, _ = os.path.splitext(log_path)
+    return stem + ".jsonl"
+
+
+# --- Segment layout ---
+# The active segment is always config.LOG_FILE (promotion_debug.log). When a new mission
+# starts and the active segment already holds MISSIONS_PER_SEGMENT missions, it is renamed
+# to promotion_debug.<seq>.log and a fresh active file is opened. promotion_debug.manifest.json
+# lists the sealed segments with their first mission id and mission count.
+def manifest_path_for(log_path: str) -> str:
+    stem, _ = os.path.splitext(log_path)
+    return stem + ".manifest.json"
+
+
+def _segment_name(log_path: str, seq: int) -> str:
+    stem, ext = os.path.splitext(os.path.basename(log_path))
+    return f"{stem}.{seq:06d}{ext or '.log'}"
+
+
+def load_manifest(log_path: str) -> dict | None:
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-
-        # Find all mission-start markers
-        mission_idxs = [i for i, line in enumerate(lines) if "=== Mission Start:" in line]
-        if len(mission_idxs) > n:
-            # Trim to last n missions
-            trim_start = mission_idxs[-n]
-            lines = lines[trim_start:]
-            with open(path, "w", encoding="utf-8") as f:
-                f.writelines(lines)
+        with open(manifest_path_for(log_path), "r", encoding="utf-8") as f:
+            m = json.load(f)
+        if isinstance(m, dict) and isinstance(m.get("segments"), list):
+            return m
     except Exception:
         pass
+    return None
+
+
+def segment_for_mission(mission_id, log_path: str | None = None) -> str | None:
+    """
+    Return the path of the log segment that holds the given mission id, or None if it
+    has been rotated out. Only the manifest is read.
+    """
+    log_path = log_path or config.LOG_FILE
+    m = load_manifest(log_path)
+    if not m:
+        return None
+    entries = m["segments"] + [dict(m.get("active") or {}, file=os.path.basename(log_path))]
+    folder = os.path.dirname(log_path)
+    found = None
+    for seg in entries:
+        first = seg.get("first_mission")
+        if first is None:
+            continue
+        try:
+            if int(first) <= int(mission_id):
+                found = seg
+        except (TypeError, ValueError):
+            if str(first) == str(mission_id):
+                found = seg
+    return os.path.join(folder, found["file"]) if found else None
+
+
+class _LogWriter(threading.Thread):
+    """
+    Drains queued log records into one persistent handle on the active segment.
+
+    Mission-start lines drive rotation: sealing a segment is a rename, and retention deletes
+    whole sealed segments, so nothing is ever reread or rewritten.
+    """
+
+    def __init__(self):
+        super().__init__(name="rankmod-log-writer", daemon=True)
+        self.path = None
+        self.fh = None
+        self.manifest = None
+        self.jsonl_path = None
+        self.jfh = None
+
+    # -- file handling --
+    def _open(self, path):
+        self._close()
+        self.path = path
+        self.manifest = load_manifest(path) or self._manifest_from_legacy(path)
+        self.fh = open(path, "ab")
+
+    def _close(self):
+        if self.fh:
+            try:
+                self.fh.close()
+            except Exception:
+                pass
+        self.fh = None
+
+    def _close_jsonl(self):
+        if self.jfh:
+            try:
+                self.jfh.close()
+            except Exception:
+                pass
+        self.jfh = None
+
+    def _flush(self):
+        for fh in (self.fh, self.jfh):
+            try:
+                if fh:
+                    fh.flush()
+            except Exception:
+                pass
+
+    @staticmethod
+    def _manifest_from_legacy(path):
+        """One-time scan of a pre-segmentation log so its missions count towards retention."""
+        active = {"first_mission": None, "missions": 0}
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    mm = _MISSION_RE.search(line)
+                    if mm:
+                        if active["first_mission"] is None:
+                            active["first_mission"] = mm.group(1)
+                        active["missions"] += 1
+        except Exception:
+            pass
+        return {"next_seq": 1, "segments": [], "active": active}
+
+    def _save_manifest(self):
+        try:
+            target = manifest_path_for(self.path)
+            tmp = target + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.manifest, f, indent=1)
+            os.replace(tmp, target)
+        except Exception:
+            pass
+
+    def _rotate(self) -> bool:
+        """Seal the active segment by renaming it. False if the rename failed (file held open
+        by a viewer); the segment keeps its missions and the next mission start retries."""
+        m = self.manifest
+        folder = os.path.dirname(self.path)
+        seq = int(m.get("next_seq", 1))
+        sealed = _segment_name(self.path, seq)
+        self._close()
+        try:
+            os.replace(self.path, os.path.join(folder, sealed))
+        except Exception:
+            self.fh = open(self.path, "ab")
+            return False
+        m["segments"].append(dict(m["active"], file=sealed))
+        m["next_seq"] = seq + 1
+        m["active"] = {"first_mission": None, "missions": 0}
+        self.fh = open(self.path, "ab")
+        return True
+
+    def _apply_retention(self):
+        m = self.manifest
+        newer = int(m["active"].get("missions", 0)) + sum(int(s.get("missions", 0)) for s in m["segments"])
+        while m["segments"]:
+            oldest = m["segments"][0]
+            if newer - int(oldest.get("missions", 0)) < KEEP_MISSIONS:
+                break
+            newer -= int(oldest.get("missions", 0))
+            m["segments"].pop(0)
+            try:
+                os.remove(os.path.join(os.path.dirname(self.path), oldest["file"]))
+            except FileNotFoundError:
+                pass
+            except Exception:
+                pass
+
+    # -- record handling --
+    def _write(self, path, line):
+        if path != self.path or not self.fh:
+            self._open(path)
+        if MISSION_MARKER in line:
+            mm = _MISSION_RE.search(line)
+            active = self.manifest["active"]
+            if active.get("missions", 0) >= MISSIONS_PER_SEGMENT and self._rotate():
+                active = self.manifest["active"]
+            active["missions"] = int(active.get("missions", 0)) + 1
+            if active.get("first_mission") is None and mm:
+                active["first_mission"] = mm.group(1)
+            self._apply_retention()
+            self._save_manifest()
+        self.fh.write(line.encode("utf-8"))
+
+    def _write_jsonl(self, path, record):
+        jpath = jsonl_path_for(path)
+        if jpath != self.jsonl_path or not self.jfh:
+            self._close_jsonl()
+            self.jsonl_path = jpath
+            self.jfh = open(jpath, "ab")
+        if self.jfh.tell() > JSONL_MAX_BYTES:
+            self._close_jsonl()
+            os.replace(jpath, jpath + ".1")
+            self.jfh = open(jpath, "ab")
+        self.jfh.write((json.dumps(record, default=str, ensure_ascii=False) + "\n").encode("utf-8"))
+
+    def _emit(self, path, ts, level, msg, args, fields):
+        """Format a queued record; this is the only place message arguments are rendered."""
+        if args:
+            try:
+                msg = msg % args
+            except Exception:
+                msg = f"{msg} {args!r}"
+        stamp = time.strftime("[%Y-%m-%d %H:%M:%S] ", time.localtime(ts))
+        self._write(path, stamp + _TEXT_TAGS.get(level, "") + msg + "\n")
+        if JSONL_ENABLED:
+            record = {"ts": stamp.strip()[1:-1], "level": LEVEL_NAMES.get(level, str(level)), "msg": msg}
+            if fields:
+                record.update(fields)
+            self._write_jsonl(path, record)
+
+    def run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = _queue.get(timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                continue
+            batch = [item]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = False
+            waiters = []
+            for rec in batch:
+                if rec is _STOP:
+                    stop = True
+                    continue
+                if isinstance(rec, threading.Event):
+                    waiters.append(rec)
+                    continue
+                try:
+                    self._emit(*rec)
+                except Exception:
+                    pass
+
+            now = time.monotonic()
+            if waiters or stop or _queue.empty() or now - last_flush >= FLUSH_INTERVAL:
+                self._flush()
+                last_flush = now
+            for ev in waiters:
+                ev.set()
+            if stop:
+                self._close()
+                self._close_jsonl()
+                return
+
+
+# --- Logging ---
+def _ensure_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = _LogWriter()
+            _writer.start()
+    return _writer
+
+
+def flush(timeout: float = 2.0) -> None:
+    """Block until all queued records have been written (bounded by timeout)."""
+    w = _writer
+    if w is None or not w.is_alive():
+        return
+    done = threading.Event()
+    _queue.put(done)
+    done.wait(timeout)
+
+
+def shutdown(timeout: float = 2.0) -> None:
+    """Flush pending records and stop the writer thread."""
+    w = _writer
+    if w is None or not w.is_alive():
+        return
+    _queue.put(_STOP)
+    w.join(timeout)
+
+
+atexit.register(shutdown)
+
+
+def log(msg: str, *args, level: int = INFO, **fields):
+    """
+    Queue a log record. 'msg' is %-formatted with 'args' on the writer thread, and only
+    if 'level' passes LOG_LEVEL. Keyword 'fields' are added to the JSONL record.
+    """
+    if level < LOG_LEVEL:
+        return
+    if _writer is None or not _writer.is_alive():
+        _ensure_writer()
+    _queue.put((config.LOG_FILE, time.time(), level, msg, args, fields))
+
+
+def debug(msg: str, *args, **fields):
+    if DEBUG >= LOG_LEVEL:
+        log(msg, *args, level=DEBUG, **fields)
+
+
+def warn(msg: str, *args, **fields):
+    log(msg, *args, level=WARN, **fields)
 
 
-def log(msg: str):
-    with open(config.LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(time.strftime("[%Y-%m-%d %H:%M:%S] ") + msg + "\n")
-    trim_log_to_last_n_missions(config.LOG_FILE, 10)
\ No newline at end of file
+def error(msg: str, *args, **fields):
+    log(msg, *args, level=ERROR, **fields)
@@ -0,0 +1,139 @@
+"""
+maintenance.py
+
+Housekeeping that only runs while IL-2 is closed (main() passes run_due to
+wait_for_il2 as its idle callback), so it never competes with the game for cp.db:
+
+- orphans:   attempt rows of pilots that no longer exist, and ledger rows whose event
+             is gone (NOT EXISTS anti-joins probing the pilot / event primary keys)
+- optimize:  ANALYZE + PRAGMA optimize and a WAL checkpoint of the mod's state database
+- max_rank:  personage.maxRank raised to 13, touching only rows below it
+
+Each job records its last run in rankmod.maintenance (state_db.py) and runs again only
+after its interval; IL-2 is re-checked before every job.
+"""
+
+from __future__ import annotations
+
+import time
+import sqlite3
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import MAINT_ORPHANS_EVERY, MAINT_OPTIMIZE_EVERY, MAINT_MAX_RANK_EVERY
+from helpers import is_il2_running, cleanup_orphaned_promotion_attempts
+from logger import log, debug, warn
+from state_db import attach_state_db, STATE_SCHEMA, EVENT_LEDGER_TABLE, MAINTENANCE_TABLE
+
+PERSONAGE_MAX_RANK = 13
+
+Job = Tuple[str, float, Callable[[sqlite3.Connection], int]]
+
+
+def raise_personage_max_rank(conn: sqlite3.Connection) -> int:
+    """Set personage.maxRank=PERSONAGE_MAX_RANK on rows below it. Returns rows changed."""
+    cur = conn.execute(
+        "UPDATE personage SET maxRank=? WHERE IFNULL(maxRank, 0) < ?",
+        (PERSONAGE_MAX_RANK, PERSONAGE_MAX_RANK),
+    )
+    conn.commit()
+    return max(0, cur.rowcount)
+
+
+def cleanup_orphans(conn: sqlite3.Connection) -> int:
+    removed = cleanup_orphaned_promotion_attempts(conn)
+    cur = conn.execute(f"""
+        DELETE FROM {EVENT_LEDGER_TABLE}
+        WHERE NOT EXISTS (
+            SELECT 1 FROM main.event e
+            WHERE e.rowid = promotion_event_ledger.eventRowid
+              AND e.type = 6 AND e.missionId = -1
+              AND e.pilotId = promotion_event_ledger.pilotId
+              AND e.rankId = promotion_event_ledger.rankId
+              AND e.date = promotion_event_ledger.date
+        )
+    """)
+    conn.commit()
+    if cur.rowcount:
+        log("[CLEANUP] Removed %s stale entries from the promotion event ledger", cur.rowcount)
+    return removed + max(0, cur.rowcount)
+
+
+def optimize_state_db(conn: sqlite3.Connection) -> int:
+    conn.execute(f"ANALYZE {STATE_SCHEMA}")
+    conn.execute(f"PRAGMA {STATE_SCHEMA}.optimize")
+    conn.commit()
+    conn.execute(f"PRAGMA {STATE_SCHEMA}.wal_checkpoint(TRUNCATE)").fetchone()
+    return 0
+
+
+DEFAULT_JOBS: List[Job] = [
+    ("max_rank", MAINT_MAX_RANK_EVERY, raise_personage_max_rank),
+    ("orphans", MAINT_ORPHANS_EVERY, cleanup_orphans),
+    ("optimize", MAINT_OPTIMIZE_EVERY, optimize_state_db),
+]
+
+
+class MaintenanceScheduler:
+    """
+    Runs the jobs that are due. The last-run times are read from the state database
+    once and then kept in memory, so a call with nothing due touches no file.
+    """
+
+    def __init__(self, db_path: str, jobs: Optional[List[Job]] = None,
+                 is_busy: Callable[[], bool] = is_il2_running,
+                 clock: Callable[[], float] = time.time):
+        self.db_path = db_path
+        self.jobs = list(DEFAULT_JOBS if jobs is None else jobs)
+        self.is_busy = is_busy
+        self.clock = clock
+        self._last_runs: Optional[Dict[str, float]] = None
+
+    def _due(self, now: float) -> List[Job]:
+        last = self._last_runs or {}
+        return [job for job in self.jobs if now - last.get(job[0], 0.0) >= job[1]]
+
+    def run_due(self) -> int:
+        """Run every due job unless IL-2 is running; returns the number of jobs run."""
+        if self._last_runs is not None and not self._due(self.clock()):
+            return 0
+        if self.is_busy():
+            return 0
+        ran = 0
+        conn = None
+        try:
+            conn = sqlite3.connect(self.db_path)
+            attach_state_db(conn)
+            if self._last_runs is None:
+                self._last_runs = {
+                    job: float(last) for job, last in conn.execute(f"SELECT job, lastRun FROM {MAINTENANCE_TABLE}")
+                }
+            for name, _, job in self._due(self.clock()):
+                if ran and self.is_busy():
+                    debug("[MAINT] IL-2 started; remaining jobs postponed")
+                    break
+                started = time.perf_counter()
+                try:
+                    rows = job(conn)
+                except Exception as e:
+                    try:
+                        conn.rollback()
+                    except Exception:
+                        pass
+                    warn("Maintenance job %s failed: %s", name, e)
+                    continue
+                now = self.clock()
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {MAINTENANCE_TABLE} (job, lastRun, rows, ranOn) "
+                    f"VALUES (?, ?, ?, datetime('now'))",
+                    (name, now, rows),
+                )
+                conn.commit()
+                self._last_runs[name] = now
+                ran += 1
+                log("[MAINT] %s: %s rows in %.1f ms", name, rows, (time.perf_counter() - started) * 1000.0)
+        except Exception as e:
+            warn("Maintenance skipped: %s", e)
+        finally:
+            if conn is not None:
+                conn.close()
+        return ran
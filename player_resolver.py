@@ -0,0 +1,107 @@
+"""
+player_resolver.py
+
+Which pilot is the real player for a mission's squadron.
+
+Rule (unchanged): among the squadron's pilots with a personageId, prefer the one with an
+event in the squadron's latest mission (highest id on ties), else the highest id.
+resolve_active_player does this with one joined query; ActivePlayerResolver memoizes
+the answer per (squadronId, latest mission id), so passes on the same mission reuse it.
+
+ensure_event_index optionally adds an index on event(missionId, pilotId) to cp.db
+(EVENT_INDEX in promotion_config.json) unless the game schema already has one usable
+for the lookup.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from typing import Dict, Optional, Tuple
+
+from logger import log, debug, warn
+
+EVENT_INDEX_NAME = "rankmod_event_mission_pilot"
+
+_ACTIVE_PLAYER_SQL = """
+    SELECT p.id,
+           EXISTS (SELECT 1 FROM event e WHERE e.missionId = :mid AND e.pilotId = p.id) AS flew
+    FROM pilot p
+    WHERE p.personageId <> '' AND p.squadronId = :sq
+    ORDER BY flew DESC, p.id DESC
+    LIMIT 1
+"""
+
+
+def latest_squadron_mission(conn: sqlite3.Connection, squadron_id) -> Optional[int]:
+    row = conn.execute("SELECT MAX(id) FROM mission WHERE squadronId = ?", (squadron_id,)).fetchone()
+    return row[0] if row else None
+
+
+def resolve_active_player(conn: sqlite3.Connection, squadron_id, latest_mission_id=None) -> Optional[int]:
+    """Active player id for squadron_id (one query), or None if it has no player pilots."""
+    if latest_mission_id is None:
+        latest_mission_id = latest_squadron_mission(conn, squadron_id)
+    row = conn.execute(_ACTIVE_PLAYER_SQL, {"mid": latest_mission_id, "sq": squadron_id}).fetchone()
+    if row is None:
+        log("No active player found for this squadron.")
+        return None
+    pid, flew = row
+    if flew:
+        debug("Selected active player id: %s (has event in latest mission %s)", pid, latest_mission_id)
+    else:
+        debug("Selected active player id: %s (fallback to highest id)", pid)
+    return pid
+
+
+class ActivePlayerResolver:
+    """resolve_active_player memoized per (squadronId, latest mission id)."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._memo: Dict[Tuple, Optional[int]] = {}
+
+    def get(self, conn: sqlite3.Connection, squadron_id) -> Optional[int]:
+        latest = latest_squadron_mission(conn, squadron_id)
+        key = (squadron_id, latest)
+        if key in self._memo:
+            return self._memo[key]
+        pid = resolve_active_player(conn, squadron_id, latest)
+        if len(self._memo) >= self.max_entries:
+            self._memo.clear()
+        self._memo[key] = pid
+        return pid
+
+    def invalidate(self) -> None:
+        self._memo.clear()
+
+
+def _has_mission_index(conn: sqlite3.Connection) -> bool:
+    """Whether an index on event starts with missionId (usable for the active player lookup)."""
+    for row in conn.execute("PRAGMA index_list(event)").fetchall():
+        cols = conn.execute(f"PRAGMA index_info({_quote(row[1])})").fetchall()
+        if cols and cols[0][2] == "missionId":
+            return True
+    return False
+
+
+def _quote(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def ensure_event_index(conn: sqlite3.Connection) -> bool:
+    """
+    Create EVENT_INDEX_NAME on event(missionId, pilotId) unless an index on missionId
+    already exists. Returns True if such an index is in place afterwards.
+    """
+    try:
+        if _has_mission_index(conn):
+            return True
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {EVENT_INDEX_NAME} ON event(missionId, pilotId)")
+        conn.commit()
+        log("[DB] Created index %s on event(missionId, pilotId)", EVENT_INDEX_NAME)
+        return True
+    except sqlite3.DatabaseError as e:
+        warn("Could not create event index: %s", e)
+        return False
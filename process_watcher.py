@@ -0,0 +1,99 @@
+"""
+process_watcher.py
+
+Cheap liveness tracking for a single named process (IL-2's il-2.exe).
+
+- The full process-table scan runs only while the process is absent, and its interval
+  backs off from min_interval up to max_interval.
+- Once found, the process is pinned by (pid, create_time); liveness checks then touch
+  only that one pid.
+- Detection goes through a provider object (scan/is_alive), so a fake provider can be
+  injected instead of psutil.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Callable, Optional, Tuple
+
+import psutil
+
+from config import POLL_INTERVAL, PROCESS_SCAN_MAX_INTERVAL
+
+
+class PsutilProvider:
+    """Default provider backed by psutil."""
+
+    def scan(self, name: str) -> Optional[Tuple[int, float]]:
+        """Walk the process table once; return (pid, create_time) of the first match."""
+        target = name.lower()
+        for p in psutil.process_iter(("name", "create_time")):
+            try:
+                pname = p.info["name"]
+                if pname and pname.lower() == target:
+                    return p.pid, p.info["create_time"]
+            except Exception:
+                pass
+        return None
+
+    def is_alive(self, pid: int, create_time: float) -> bool:
+        """True if pid still exists and is the same process (pid reuse is caught by create_time)."""
+        try:
+            proc = psutil.Process(pid)
+            if create_time is not None and proc.create_time() != create_time:
+                return False
+            return proc.status() != psutil.STATUS_ZOMBIE
+        except psutil.NoSuchProcess:
+            return False
+        except psutil.AccessDenied:
+            return psutil.pid_exists(pid)
+        except Exception:
+            return False
+
+
+class ProcessWatcher:
+    def __init__(
+        self,
+        name: str,
+        provider=None,
+        min_interval: float = POLL_INTERVAL,
+        max_interval: float = PROCESS_SCAN_MAX_INTERVAL,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.name = name
+        self.provider = provider or PsutilProvider()
+        self.min_interval = float(min_interval)
+        self.max_interval = max(float(max_interval), self.min_interval)
+        self.sleep = sleep
+        self.pid: Optional[int] = None
+        self.create_time: Optional[float] = None
+
+    def _pin(self, found: Optional[Tuple[int, float]]) -> bool:
+        if not found:
+            self.pid, self.create_time = None, None
+            return False
+        self.pid, self.create_time = found
+        return True
+
+    def is_running(self) -> bool:
+        """Pinned: single-pid liveness check. Unpinned: one full scan."""
+        if self.pid is not None:
+            if self.provider.is_alive(self.pid, self.create_time):
+                return True
+            self._pin(None)
+            return False
+        return self._pin(self.provider.scan(self.name))
+
+    def wait_until_running(self, idle: Optional[Callable[[], None]] = None) -> int:
+        """
+        Block until the process appears and return its pid.
+        Scans at min_interval first, doubling the gap up to max_interval while absent.
+        idle (optional) runs after each scan that found nothing, before sleeping.
+        """
+        interval = self.min_interval
+        while not self.is_running():
+            if idle is not None:
+                idle()
+            self.sleep(interval)
+            interval = min(interval * 2, self.max_interval)
+        return self.pid
@@ -5,10 +5,14 @@ Contains only the promotion decision + DB updates for the "Rank Mod Light" runne
 
 Exports:
 - set_promotion_config(cfg)
-- try_promote(conn, pid, rank, pcp, sorties, good, thresholds, current_date_str, is_player=True)
+- try_promote(conn, pid, rank, pcp, sorties, good, thresholds, current_date_str, is_player=True,
+              stats=None, write_set=None, state=None)
+- new_pass_stats()
+- PassWriteSet
 
 Assumptions:
-- The caller (rank_promotion_checker_light.py) ensures the table promotion_attempts exists.
+- The caller (rank_promotion_checker_light.py) attaches the mod state database, so the
+  attempts table (state_db.ATTEMPTS_TABLE) exists.
 - Dates are normalized via helpers.normalize_mission_date() to 'YYYY.MM.DD'.
 """
 
@@ -16,11 +20,12 @@ from __future__ import annotations
 
 import sqlite3
 import random
-from datetime import datetime
 from typing import Sequence
 
-from logger import log
-from helpers import normalize_mission_date
+from logger import log, debug
+from helpers import normalize_mission_date, mission_day_ordinal
+from promotion_state import PromotionStateStore, upsert_attempts
+from state_db import ATTEMPTS_TABLE
 
 # Defaults (overridden at runtime by set_promotion_config(cfg))
 PROMOTION_COOLDOWN_DAYS = 2
@@ -45,12 +50,71 @@ def set_promotion_config(cfg: dict) -> None:
         pass
 
 
-def _parse_day(date_str: str) -> datetime:
+def new_pass_stats() -> dict:
     """
-    Parse a mission day string into a datetime (midnight), after normalizing to 'YYYY.MM.DD'.
+    Counters filled by try_promote(stats=...) during one promotion pass.
+    The caller adds 'scanned' and the elapsed time and logs one summary record.
     """
-    canonical = normalize_mission_date(str(date_str))
-    return datetime.strptime(canonical, "%Y.%m.%d")
+    return {"scanned": 0, "eligible": 0, "promoted": 0, "cooldown": 0, "failed_rolls": 0}
+
+
+class PassWriteSet:
+    """Rank updates and type=6 events of one pass, applied in one transaction."""
+
+    def __init__(self):
+        self.ranks: dict[int, int] = {}               # pilotId -> new rankId
+        self.events: list[tuple[int, int, str]] = []  # (pilotId, new rankId, mission date)
+
+    def __bool__(self) -> bool:
+        return bool(self.ranks or self.events)
+
+    def set_rank(self, pid: int, rank: int) -> None:
+        self.ranks[pid] = rank
+
+    def add_event(self, pid: int, rank: int, mission_date: str) -> None:
+        self.events.append((pid, rank, mission_date))
+
+    def pilot_ids(self) -> set[int]:
+        return set(self.ranks) | {pid for pid, _, _ in self.events}
+
+    def subset(self, pids) -> "PassWriteSet":
+        """The writes of the given pilots only (events keep their order)."""
+        pids = set(pids)
+        part = PassWriteSet()
+        part.ranks = {pid: r for pid, r in self.ranks.items() if pid in pids}
+        part.events = [e for e in self.events if e[0] in pids]
+        return part
+
+    def apply_pilot_writes(self, cur: sqlite3.Cursor) -> None:
+        """Rank updates via executemany; the caller owns the transaction."""
+        if self.ranks:
+            cur.executemany(
+                "UPDATE pilot SET rankId=? WHERE id=?",
+                [(rank, pid) for pid, rank in self.ranks.items()],
+            )
+
+
+def _count(stats: dict | None, key: str) -> None:
+    if stats is not None:
+        stats[key] = stats.get(key, 0) + 1
+
+
+def _record_attempt(conn, write_set, state, pid: int, day_str: str, success: bool, fail_count: int,
+                    promote_to: int | None = None) -> None:
+    """Player attempt outcome (+ new rank on success): collected for the pass, or written and committed now."""
+    if promote_to is not None:
+        if write_set is not None:
+            write_set.set_rank(pid, promote_to)
+        else:
+            conn.execute("UPDATE pilot SET rankId=? WHERE id=?", (promote_to, pid))
+
+    if state is not None:
+        state.record(pid, day_str, success, fail_count)
+    else:
+        upsert_attempts(conn.cursor(), [(pid, day_str, 1 if success else 0, fail_count)])
+
+    if write_set is None:
+        conn.commit()
 
 
 def try_promote(
@@ -63,6 +127,9 @@ def try_promote(
     thresholds: Sequence[Sequence[float]],
     current_date_str: str,
     is_player: bool = True,
+    stats: dict | None = None,
+    write_set: PassWriteSet | None = None,
+    state: PromotionStateStore | None = None,
 ) -> int:
     """
     Returns the (possibly updated) rankId for this pilot.
@@ -78,6 +145,12 @@ def try_promote(
     Player:
       - Uses promotion_attempts to enforce cooldown after failed attempts
       - Chance-based promotion (decreases with rank), forced after PROMOTION_FAIL_THRESHOLD fails
+
+    stats (optional): counters from new_pass_stats(), updated per outcome.
+    write_set (optional): collect rank updates there instead of executing and committing them.
+    state (optional): PromotionStateStore preloaded for the pass; attempt state is read
+    from and recorded into it instead of the promotion_attempts table. Pass it whenever
+    write_set is given.
     """
 
     # Coerce numeric inputs safely
@@ -102,62 +175,76 @@ def try_promote(
         return rank
 
     pr, sr, fr = thresholds[idx]
-    current_day = _parse_day(current_date_str)
+    current_day = mission_day_ordinal(current_date_str)
     canonical_day_str = normalize_mission_date(current_date_str)  # store canonical in DB
 
     # Eligibility check
     if not (p >= pr or (s >= sr and failure <= fr)):
-        log(f"Pilot {pid} does not meet threshold for rank {rank + 1}")
+        debug("Pilot %s does not meet threshold for rank %s", pid, rank + 1)
         return rank
+    _count(stats, "eligible")
 
     # --- AI logic: always promote if eligible ---
     if not is_player:
         promote_to = rank + 1
-        conn.execute("UPDATE pilot SET rankId=? WHERE id=?", (promote_to, pid))
-        conn.commit()
-        log(f"[AI] Pilot {pid} promoted to rank {promote_to} (auto)")
+        if write_set is not None:
+            write_set.set_rank(pid, promote_to)
+        else:
+            conn.execute("UPDATE pilot SET rankId=? WHERE id=?", (promote_to, pid))
+            conn.commit()
+        _count(stats, "promoted")
+        log("[AI] Pilot %s promoted to rank %s (auto)", pid, promote_to)
         return promote_to
 
     # --- Player logic: cooldown + chance + attempts tracking ---
-    cur = conn.cursor()
-    cur.execute(
-        """
-        SELECT last_attempt, last_success, fail_count
-        FROM promotion_attempts
-        WHERE pilotId = ?
-        """,
-        (pid,),
-    )
-    row = cur.fetchone()
-
+    found = False
+    last_attempt = None
     last_attempt_day = None
     last_success = None
     fail_count = 0
 
-    if row:
-        try:
-            # last_attempt may already be canonical; normalize anyway for safety
-            last_attempt_day = _parse_day(row[0])
-        except Exception:
-            last_attempt_day = None
-
-        last_success = row[1]
-        fail_count = int(row[2] or 0)
-
-        log(
-            f"[DEBUG] Pilot {pid} promotion state — last_success={last_success}, "
-            f"fail_count={fail_count}, last_attempt={last_attempt_day}, current_day={current_day}"
+    if state is not None:
+        st = state.get(pid)
+        if st is not None:
+            found = True
+            last_attempt, last_attempt_day = st.last_attempt, st.day
+            last_success, fail_count = st.last_success, st.fail_count
+    else:
+        row = conn.execute(
+            f"""
+            SELECT last_attempt, last_success, fail_count
+            FROM {ATTEMPTS_TABLE}
+            WHERE pilotId = ?
+            """,
+            (pid,),
+        ).fetchone()
+        if row:
+            found = True
+            last_attempt = row[0]
+            try:
+                # last_attempt may already be canonical; normalize anyway for safety
+                last_attempt_day = mission_day_ordinal(str(row[0]))
+            except Exception:
+                last_attempt_day = None
+            last_success = row[1]
+            fail_count = int(row[2] or 0)
+
+    if found:
+        debug(
+            "[DEBUG] Pilot %s promotion state — last_success=%s, fail_count=%s, last_attempt=%s, current_day=%s",
+            pid, last_success, fail_count, last_attempt, canonical_day_str,
         )
 
         # Cooldown only after FAILED attempt (last_success == 0)
         if last_success == 0 and last_attempt_day is not None:
-            days_since = (current_day - last_attempt_day).days
-            log(
-                f"[DEBUG] Cooldown comparison for pilot {pid}: days_since={days_since}, "
-                f"required_cooldown={PROMOTION_COOLDOWN_DAYS}"
+            days_since = current_day - last_attempt_day
+            debug(
+                "[DEBUG] Cooldown comparison for pilot %s: days_since=%s, required_cooldown=%s",
+                pid, days_since, PROMOTION_COOLDOWN_DAYS,
             )
             if days_since < PROMOTION_COOLDOWN_DAYS:
-                log(f"Pilot {pid} in cooldown period ({days_since} days since last failed attempt).")
+                _count(stats, "cooldown")
+                debug("Pilot %s in cooldown period (%s days since last failed attempt).", pid, days_since)
                 return rank
 
     # Chance decreases with rank step; floor at 0.25
@@ -167,57 +254,25 @@ def try_promote(
     # Forced promotion after too many failures
     if fail_count >= PROMOTION_FAIL_THRESHOLD:
         promote_to = rank + 1
-        conn.execute("UPDATE pilot SET rankId=? WHERE id=?", (promote_to, pid))
-        cur.execute(
-            """
-            INSERT INTO promotion_attempts (pilotId, last_attempt, last_success, fail_count)
-            VALUES (?, ?, 1, 0)
-            ON CONFLICT(pilotId) DO UPDATE SET
-                last_attempt=excluded.last_attempt,
-                last_success=1,
-                fail_count=0
-            """,
-            (pid, canonical_day_str),
-        )
-        conn.commit()
-        log(f"[PLAYER] Pilot {pid} forced promotion to {promote_to} after {fail_count} failures.")
+        _record_attempt(conn, write_set, state, pid, canonical_day_str, True, 0, promote_to)
+        _count(stats, "promoted")
+        log("[PLAYER] Pilot %s forced promotion to %s after %s failures.", pid, promote_to, fail_count)
         return promote_to
 
     # Roll for promotion
     roll = random.random()
-    log(f"[PLAYER] Pilot {pid}: roll={roll:.3f}, chance={chance:.3f} for rank {rank + 1}")
+    log("[PLAYER] Pilot %s: roll=%.3f, chance=%.3f for rank %s", pid, roll, chance, rank + 1)
 
     if roll <= chance:
         promote_to = rank + 1
-        conn.execute("UPDATE pilot SET rankId=? WHERE id=?", (promote_to, pid))
-        cur.execute(
-            """
-            INSERT INTO promotion_attempts (pilotId, last_attempt, last_success, fail_count)
-            VALUES (?, ?, 1, 0)
-            ON CONFLICT(pilotId) DO UPDATE SET
-                last_attempt=excluded.last_attempt,
-                last_success=1,
-                fail_count=0
-            """,
-            (pid, canonical_day_str),
-        )
-        conn.commit()
-        log(f"[PLAYER] Pilot {pid} promoted to rank {promote_to}")
+        _record_attempt(conn, write_set, state, pid, canonical_day_str, True, 0, promote_to)
+        _count(stats, "promoted")
+        log("[PLAYER] Pilot %s promoted to rank %s", pid, promote_to)
         return promote_to
 
     # Failed attempt: increment fail_count and record
     fail_count += 1
-    cur.execute(
-        """
-        INSERT INTO promotion_attempts (pilotId, last_attempt, last_success, fail_count)
-        VALUES (?, ?, 0, ?)
-        ON CONFLICT(pilotId) DO UPDATE SET
-            last_attempt=excluded.last_attempt,
-            last_success=0,
-            fail_count=excluded.fail_count
-        """,
-        (pid, canonical_day_str, fail_count),
-    )
-    conn.commit()
-    log(f"[PLAYER] Pilot {pid} failed promotion. Fail count now {fail_count}")
+    _record_attempt(conn, write_set, state, pid, canonical_day_str, False, fail_count)
+    _count(stats, "failed_rolls")
+    log("[PLAYER] Pilot %s failed promotion. Fail count now %s", pid, fail_count)
     return rank
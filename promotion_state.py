@@ -0,0 +1,101 @@
+"""
+promotion_state.py
+
+In-memory copy of the promotion_attempts table (state_db.ATTEMPTS_TABLE) for one promotion pass.
+
+The whole table is loaded with one query, last_attempt dates are pre-parsed to day
+ordinals, and try_promote(state=...) reads and updates rows here instead of querying
+per pilot. Only rows touched during the pass are written back (write_back), inside
+the pass transaction.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from helpers import mission_day_ordinal
+from state_db import ATTEMPTS_TABLE
+
+
+def upsert_attempts(cur, rows, table: str = ATTEMPTS_TABLE) -> None:
+    """Upsert (pilotId, last_attempt, last_success, fail_count) rows via executemany."""
+    cur.executemany(
+        f"""
+        INSERT INTO {table} (pilotId, last_attempt, last_success, fail_count)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(pilotId) DO UPDATE SET
+            last_attempt=excluded.last_attempt,
+            last_success=excluded.last_success,
+            fail_count=excluded.fail_count
+        """,
+        rows,
+    )
+
+
+class AttemptState:
+    __slots__ = ("last_attempt", "day", "last_success", "fail_count")
+
+    def __init__(self, last_attempt: Optional[str], day: Optional[int], last_success, fail_count: int):
+        self.last_attempt = last_attempt  # canonical 'YYYY.MM.DD' as stored
+        self.day = day                    # ordinal of last_attempt, None if unparsable
+        self.last_success = last_success
+        self.fail_count = fail_count
+
+
+def _ordinal_or_none(date_str) -> Optional[int]:
+    try:
+        return mission_day_ordinal(str(date_str))
+    except Exception:
+        return None
+
+
+class PromotionStateStore:
+    def __init__(self):
+        self.rows: Dict[int, AttemptState] = {}
+        self.dirty: set[int] = set()
+
+    @classmethod
+    def load(cls, conn: sqlite3.Connection, table: str = ATTEMPTS_TABLE) -> "PromotionStateStore":
+        store = cls()
+        for pid, last_attempt, last_success, fail_count in conn.execute(
+            f"SELECT pilotId, last_attempt, last_success, fail_count FROM {table}"
+        ):
+            store.rows[pid] = AttemptState(
+                last_attempt, _ordinal_or_none(last_attempt), last_success, int(fail_count or 0)
+            )
+        return store
+
+    def get(self, pid: int) -> Optional[AttemptState]:
+        return self.rows.get(pid)
+
+    def record(self, pid: int, day_str: str, success: bool, fail_count: int) -> None:
+        self.rows[pid] = AttemptState(day_str, _ordinal_or_none(day_str), 1 if success else 0, fail_count)
+        self.dirty.add(pid)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[Tuple[int, AttemptState]]:
+        return iter(self.rows.items())
+
+    def dirty_rows(self, pids=None) -> List[Tuple[int, Optional[str], int, int]]:
+        dirty = self.dirty if pids is None else self.dirty.intersection(pids)
+        return [
+            (pid, st.last_attempt, st.last_success, st.fail_count)
+            for pid, st in ((pid, self.rows[pid]) for pid in sorted(dirty))
+        ]
+
+    def write_back(self, cur: sqlite3.Cursor, table: str = ATTEMPTS_TABLE, pids=None) -> int:
+        """Upsert dirty rows (only those in pids, if given); the caller owns the transaction."""
+        rows = self.dirty_rows(pids)
+        if rows:
+            upsert_attempts(cur, rows, table)
+        return len(rows)
+
+    def mark_clean(self, pids=None) -> None:
+        """Call after the transaction holding write_back() committed."""
+        if pids is None:
+            self.dirty.clear()
+        else:
+            self.dirty.difference_update(pids)
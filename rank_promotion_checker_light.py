@@ -19,7 +19,7 @@ import signal
 import string
 import argparse
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import psutil
@@ -34,10 +34,25 @@ except Exception:
    
 
 import config
-from config import POLL_INTERVAL, LOCALE_MAP
-from helpers import is_il2_running, normalize_mission_date
-from logger import log
-from promotion import try_promote, set_promotion_config  # thresholds injected at runtime
+import logger
+from config import POLL_INTERVAL, LOCALE_MAP, WATCH_IDLE_TIMEOUT, PASS_CHUNK_ROWS, PASS_CHUNK_MS, PASS_CHUNK_PAUSE
+from helpers import is_il2_running, wait_for_il2, normalize_mission_date
+from logger import log, debug, warn, error
+from promotion import try_promote, set_promotion_config, new_pass_stats, PassWriteSet  # thresholds injected at runtime
+from db import ConnectionManager, ChangeDetector, BusyRetryWriter, WriteDeferred, EvaluationSnapshot, is_busy_error
+from career_watcher import open_career_watcher
+from squadron_cache import SquadronCache
+from eligibility import (fetch_eligible_pilots, select_evaluator, stage_changed_pilots,
+                         remember_staged_pilots, STAGED_PILOTS, DEFAULT_MAX_RANK)
+from promotion_state import PromotionStateStore
+from checkpoint import (Checkpoint, mission_fingerprint, load_checkpoint, checkpoint_matches, save_checkpoint,
+                        journal_pass, clear_pass_journal, replayed_promotions,
+                        pass_key, load_pass_cursor, pending_pass_end, save_pass_cursor, clear_pass_cursor)
+from state_db import attach_state_db, ATTEMPTS_TABLE, MIGRATIONS_TABLE
+from event_ledger import ledger_has_event, ledger_record, ledger_record_journaled
+from player_resolver import ActivePlayerResolver, resolve_active_player, ensure_event_index
+from carry_over import CarryOverCache, pilot_columns
+from maintenance import MaintenanceScheduler, raise_personage_max_rank, PERSONAGE_MAX_RANK
 
 DEFAULT_THRESHOLDS = [
     [210, 80,  0.10],
@@ -82,6 +97,17 @@ def _cleanup_lock(path):
 def _cfg_path_for(gp: str) -> str:
     return os.path.join(gp, "data", "Career", "promotion_config.json")
 
+def _cfg_flag(value, default: bool = False) -> bool:
+    """A config switch: JSON true/false, or a hand-edited "true"/"1"/"yes"/"on" ("false"/"0"/...)."""
+    if isinstance(value, str):
+        v = value.strip().lower()
+        if v in ("1", "true", "yes", "on"):
+            return True
+        if v in ("", "0", "false", "no", "off"):
+            return False
+        return default
+    return default if value is None else bool(value)
+
 def _load_cfg_if_valid(cfg_path: str):
     try:
         if not os.path.isfile(cfg_path):
@@ -101,6 +127,11 @@ def _load_cfg_if_valid(cfg_path: str):
         cfg['max_ranks'] = {**DEFAULT_MAX_RANKS, **{str(k): int(v) for k, v in mr.items()}}
         cfg['PROMOTION_COOLDOWN_DAYS'] = int(cfg.get('PROMOTION_COOLDOWN_DAYS', 2))
         cfg['PROMOTION_FAIL_THRESHOLD'] = int(cfg.get('PROMOTION_FAIL_THRESHOLD', 3))
+        cfg['LOG_LEVEL'] = str(cfg.get('LOG_LEVEL', 'INFO')).upper()
+        cfg['LOG_JSONL'] = _cfg_flag(cfg.get('LOG_JSONL'))
+        cfg['EVALUATOR'] = str(cfg.get('EVALUATOR', 'sql')).lower()
+        cfg['EVENT_INDEX'] = _cfg_flag(cfg.get('EVENT_INDEX'))
+        cfg['SNAPSHOT_EVAL'] = _cfg_flag(cfg.get('SNAPSHOT_EVAL'))
         return cfg
     except Exception:
         return None
@@ -201,6 +232,8 @@ def tk_first_run_wizard(locale_map) -> tuple[str | None, str | None]:
             "thresholds": DEFAULT_THRESHOLDS,
             "PROMOTION_COOLDOWN_DAYS": 2,
             "PROMOTION_FAIL_THRESHOLD": 3,
+            "LOG_LEVEL": "INFO",
+            "LOG_JSONL": False,
         }
 
         # Try write now; if permission denied, offer elevation here
@@ -523,7 +556,7 @@ def ensure_config_interactive() -> Dict[str, Any]:
 
     # No config on disk → run the wizard (this writes promotion_config.json)
     if not tk:
-        log("[ERROR] Tk not available; cannot prompt for first-time setup.")
+        error("Tk not available; cannot prompt for first-time setup.")
         return {"game_path": "", "language": "ENG",
                 "thresholds": DEFAULT_THRESHOLDS, "max_ranks": dict(DEFAULT_MAX_RANKS),
                 "PROMOTION_COOLDOWN_DAYS": 2, "PROMOTION_FAIL_THRESHOLD": 3}
@@ -549,6 +582,8 @@ def ensure_config_interactive() -> Dict[str, Any]:
             "thresholds": DEFAULT_THRESHOLDS,
             "PROMOTION_COOLDOWN_DAYS": 2,
             "PROMOTION_FAIL_THRESHOLD": 3,
+            "LOG_LEVEL": "INFO",
+            "LOG_JSONL": False,
         }
         with open(config.CONFIG_FILE, "w", encoding="utf-8") as f:
             json.dump(cfg, f, indent=2)
@@ -565,239 +600,578 @@ def to_midnight(date_str: str) -> str:
     return f"{d} 00:00:00"
 
 
-def resolve_squadron_config_id(cur: sqlite3.Cursor, pilot_squadron_row_id: int) -> int:
-    row = cur.execute("SELECT configID FROM squadron WHERE id = ?", (pilot_squadron_row_id,)).fetchone()
-    return int(row[0]) if row and row[0] is not None else -1
+_EVENT_INSERT_SQL = """
+    INSERT INTO event(
+        date, type, pilotId, rankId, missionId,
+        squadronId, careerId,
+        ipar1, ipar2, ipar3, ipar4,
+        tpar1, tpar2, tpar3, tpar4,
+        isDeleted
+    )
+    VALUES (
+        ?, 6, ?, ?, -1,
+        ?, ?,
+        ?, -1, -1, -1,
+        ?, '', '', '',
+        0
+    )
+"""
+
+# Bound parameters per IN (...) chunk; stays below SQLite's default variable limit
+_PILOT_LOOKUP_CHUNK = 500
 
 
-def resolve_event_career_id(cur: sqlite3.Cursor, pilot_squadron_row_id: int) -> int:
-    """Return the squadron.careerId for the pilot's squadron row id."""
-    row = cur.execute(
-        "SELECT careerId FROM squadron WHERE id = ?",
-        (pilot_squadron_row_id,)
-    ).fetchone()
-    return int(row[0]) if row and row[0] is not None else -1
+def _pilot_event_info(cur: sqlite3.Cursor, pilot_ids) -> Dict[int, tuple]:
+    """pilot.id -> (name, lastName, squadronId, squadron.configID, squadron.careerId), one joined query."""
+    ids = sorted(set(pilot_ids))
+    info = {}
+    for i in range(0, len(ids), _PILOT_LOOKUP_CHUNK):
+        chunk = ids[i:i + _PILOT_LOOKUP_CHUNK]
+        marks = ",".join("?" * len(chunk))
+        for pid, name, last_name, sq_id, config_id, career_id in cur.execute(f"""
+            SELECT p.id, p.name, p.lastName, p.squadronId, s.configID, s.careerId
+            FROM pilot p
+            LEFT JOIN squadron s ON s.id = p.squadronId
+            WHERE p.id IN ({marks})
+        """, chunk):
+            info[pid] = (name, last_name, sq_id, config_id, career_id)
+    return info
 
 
-def insert_promotion_event(conn: sqlite3.Connection, pilot_id: int, new_rank: int, mission_date: str) -> bool:
+def insert_promotion_events(conn: sqlite3.Connection, events, commit: bool = True) -> int:
     """
-    Insert a type=6 promotion event per Alex's specification.
-    Returns True if inserted, False if a duplicate already existed.
+    Insert type=6 promotion events for a batch of (pilot_id, new_rank, mission_date).
+    Names and squadron configId/careerId come from one joined pilot/squadron query,
+    duplicates are filtered through the event ledger (and within the batch), and the
+    remaining rows go in with one executemany; the ledger is then filled from the new
+    event rowids. Logs an [EVENT] or [SKIP] line per event.
+    commit=False leaves the inserts to the caller's transaction.
+    Returns the number of events inserted.
     """
     cur = conn.cursor()
+    info = _pilot_event_info(cur, [pid for pid, _, _ in events])
 
-    # Pilot info
-    prow = cur.execute("""
-        SELECT name, lastName, squadronId, personageId
-        FROM pilot WHERE id = ?
-    """, (pilot_id,)).fetchone()
-    if not prow:
-        log(f"[WARN] Pilot {pilot_id} not found for event insert")
-        return False
-    name, last_name, pilot_squadron_row_id, personage_id = prow
-    full_name = f"{name} {last_name}".strip()
-
-    # Map to event.squadronId = squadron.configId
-    event_squadron_id = resolve_squadron_config_id(cur, pilot_squadron_row_id)
-
-    # Resolve event.careerId via squadron.careerId (pilot's squadron row)
-    career_id = resolve_event_career_id(cur, pilot_squadron_row_id)
-    if career_id < 0:
-        log(f"[WARN] No careerId on squadron id {pilot_squadron_row_id}; writing -1 for event.careerId")
-
-    promo_date = to_midnight(mission_date)
-       
-    # Atomic insert with de-dup guard
-    cur.execute("""
-        INSERT INTO event(
-            date, type, pilotId, rankId, missionId,
-            squadronId, careerId,
-            ipar1, ipar2, ipar3, ipar4,
-            tpar1, tpar2, tpar3, tpar4,
-            isDeleted
-        )
-        SELECT
-            ?, 6, ?, ?, -1,
-            ?, ?,
-            ?, -1, -1, -1,
-            ?, '', '', '',
-            0
-        WHERE NOT EXISTS (
-            SELECT 1 FROM event
-            WHERE type=6 AND pilotId=? AND rankId=? AND date=? AND missionId=-1
-        )
-    """, (
-        promo_date,
-        pilot_id, new_rank,
-        event_squadron_id, career_id,
-        new_rank,
-        full_name,
-        pilot_id, new_rank, promo_date
-    ))
-
-    if cur.rowcount == 0:
-        log(f"[SKIP] Duplicate promotion event for pilot {pilot_id} rank {new_rank} date {promo_date}")
-        return False
-
-    conn.commit()
-    log(f"[EVENT] Inserted type=6 for pilot {pilot_id} → rank {new_rank} on {promo_date}")
-    return True
-
+    rows = []
+    inserted = []
+    seen = set()
+    for pilot_id, new_rank, mission_date in events:
+        pinfo = info.get(pilot_id)
+        if pinfo is None:
+            warn("Pilot %s not found for event insert", pilot_id)
+            continue
+        name, last_name, pilot_squadron_row_id, config_id, career_id = pinfo
+        full_name = f"{name} {last_name}".strip()
+
+        # Map to event.squadronId = squadron.configId; event.careerId = squadron.careerId
+        event_squadron_id = int(config_id) if config_id is not None else -1
+        career_id = int(career_id) if career_id is not None else -1
+        if career_id < 0:
+            warn("No careerId on squadron id %s; writing -1 for event.careerId", pilot_squadron_row_id)
+
+        promo_date = to_midnight(mission_date)
+        key = (pilot_id, new_rank, promo_date)
+        if key in seen or ledger_has_event(cur, pilot_id, new_rank, promo_date):
+            log("[SKIP] Duplicate promotion event for pilot %s rank %s date %s", pilot_id, new_rank, promo_date)
+            continue
+        seen.add(key)
+        rows.append((promo_date, pilot_id, new_rank, event_squadron_id, career_id, new_rank, full_name))
+        inserted.append(key)
+
+    if rows:
+        before = cur.execute("SELECT IFNULL(MAX(rowid), 0) FROM main.event").fetchone()[0]
+        cur.executemany(_EVENT_INSERT_SQL, rows)
+        for rowid, pilot_id, new_rank, promo_date in cur.execute("""
+            SELECT rowid, pilotId, rankId, date FROM main.event
+            WHERE rowid > ? AND type = 6 AND missionId = -1
+        """, (before,)).fetchall():
+            ledger_record(cur, pilot_id, new_rank, promo_date, rowid)
+
+    if commit:
+        conn.commit()
+    for pilot_id, new_rank, promo_date in inserted:
+        log("[EVENT] Inserted type=6 for pilot %s → rank %s on %s", pilot_id, new_rank, promo_date)
+    return len(rows)
 
-def build_squadron_country_map(cur: sqlite3.Cursor) -> Dict[int, int]:
-    # squadron.configId // 1000 yields the country code
-    cur.execute("SELECT id, configID FROM squadron")
-    return {row[0]: (row[1] // 1000) for row in cur.fetchall()}
 
-def get_active_player_id_light(conn: sqlite3.Connection, mission_squadron: int):
+def get_active_player_id_light(conn: sqlite3.Connection, mission_squadron: int,
+                               players: ActivePlayerResolver | None = None):
     """
     Returns the id of the real player pilot in the current mission's squadron,
     preferring the one with most recent mission activity, mirroring the original logic.
+    One joined query (player_resolver.resolve_active_player); with 'players' the answer is
+    memoized per (squadron, latest mission id).
     """
-    cur = conn.cursor()
-    # Candidates: pilots with a non-empty personageId in this squadron
-    cur.execute("""
-        SELECT id FROM pilot
-        WHERE personageId <> '' AND squadronId = ?
-    """, (mission_squadron,))
-    candidates = [row[0] for row in cur.fetchall()]
-    log(f"Possible player candidates in squadron {mission_squadron}: {candidates}")
-
-    if not candidates:
-        log("No active player found for this squadron.")
-        return None
-
-    # Latest mission for this squadron
-    cur.execute("""
-        SELECT id FROM mission
-        WHERE squadronId = ?
-        ORDER BY id DESC
-        LIMIT 1
-    """, (mission_squadron,))
-    mission_row = cur.fetchone()
-    latest_mission_id = mission_row[0] if mission_row else None
-
-    # Prefer the candidate who has an event in the latest mission
-    if latest_mission_id:
-        for pid in sorted(candidates, reverse=True):  # Prefer higher id if multiple
-            cur.execute("""
-                SELECT 1 FROM event WHERE pilotId = ? AND missionId = ? LIMIT 1
-            """, (pid, latest_mission_id))
-            if cur.fetchone():
-                log(f"Selected active player id: {pid} (has event in latest mission {latest_mission_id})")
-                return pid
-
-    # Fallback: highest id
-    selected_pid = max(candidates)
-    log(f"Selected active player id: {selected_pid} (fallback to highest id)")
-    return selected_pid
-
-
-def check_all_pilots_light(conn: sqlite3.Connection,
-                           thresholds,
-                           max_ranks: Dict[str, int],
-                           language: str,
-                           mission_squadron: int,
-                           squadron_country_map: Dict[int, int],
-                           mission_date: str) -> None:
+    if players is not None:
+        return players.get(conn, mission_squadron)
+    return resolve_active_player(conn, mission_squadron)
+
+
+class PassContext:
+    """What every promotion pass needs: the writer connection, the rules and the caches."""
+
+    def __init__(self, conn, thresholds, max_ranks: Dict[str, int], language: str,
+                 squadrons: SquadronCache, evaluator=fetch_eligible_pilots,
+                 players: ActivePlayerResolver | None = None, carry: CarryOverCache | None = None,
+                 writer: BusyRetryWriter | None = None, snapshot: EvaluationSnapshot | None = None):
+        self.conn = conn
+        self.thresholds = thresholds
+        self.max_ranks = max_ranks
+        self.language = language
+        self.squadrons = squadrons
+        self.evaluator = evaluator
+        self.players = players
+        self.carry = carry
+        self.writer = writer
+        self.snapshot = snapshot
+
+    def read(self, squadron_ids) -> sqlite3.Connection:
+        """Where staging and evaluation read: a fresh snapshot for squadron_ids, or conn itself."""
+        return self.snapshot.refresh(squadron_ids) if self.snapshot is not None else self.conn
+
+
+def check_all_pilots_light(ctx: PassContext, mission_squadron: int, mission_date: str,
+                           checkpoint: Checkpoint | None = None) -> None:
     """
-    Light version: applies promotion logic and writes type=6 events.
-    No UI (only at initial setup), no popups.
-    Promotions obey country ceilings from max_ranks.
+    Light version: applies promotion logic and writes type=6 events for one day.
+    Promotions obey country ceilings; only pilots whose stats changed since the last
+    pass are evaluated (ctx.evaluator), and all writes plus 'checkpoint' are committed
+    in one transaction (through ctx.writer when set; see _run_promotion_days).
     """
-    cur = conn.cursor()
+    conn = ctx.conn
+    attach_state_db(conn)
 
-    # Ensure promotion_attempts table exists (for player promotion tracking)
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS promotion_attempts (
-            pilotId INTEGER PRIMARY KEY,
-            last_attempt TEXT,
-            last_success INTEGER,
-            fail_count INTEGER DEFAULT 0
-        )
-    """)
-
-    active_player_id = get_active_player_id_light(conn, mission_squadron)
+    read = ctx.read([mission_squadron])
+    active_player_id = get_active_player_id_light(read, mission_squadron, ctx.players)
     if active_player_id:
-        migrate_player_stats_by_description_if_needed(conn, active_player_id)
-    cur.execute("""
-        SELECT id, rankId, pcp, sorties, goodSorties, squadronId, personageId, name, lastName
-        FROM pilot
-        WHERE isDeleted = 0
-    """)
+        if migrate_player_stats_by_description_if_needed(conn, active_player_id, ctx.carry) and read is not conn:
+            read = ctx.read([mission_squadron])  # the carry-over rewrote the player's row
 
-    for (pid, rank, pcp, sorties, good, pilot_sq, personage_id, first, last) in cur.fetchall():
-        # Determine pilot country from squadron map (default to 201 if missing)
-        pilot_country = squadron_country_map.get(pilot_sq, 201)
-        max_rank_allowed = int(max_ranks.get(str(pilot_country), 13))
+    _run_promotion_days(ctx, [mission_date], active_player_id, checkpoint=checkpoint, read=read)
 
-        # Only ranks >=4 are managed by mod; respect ceiling
-        if rank < 4 or rank >= max_rank_allowed:
-            continue
 
-        is_player = (pid == active_player_id)
-        new_rank = try_promote(conn, pid, rank, pcp, sorties, good, thresholds, mission_date, is_player=is_player)
+def check_backlog_light(ctx: PassContext, days: List[Tuple[str, int, Checkpoint | None]]) -> None:
+    """
+    Catch up several pending days, [(mission_date, mission_squadron, checkpoint)] in order.
+    Consecutive days with the same active player are simulated together in memory and
+    written once with the checkpoint of the last day; a player whose description
+    carry-over could still apply is stepped day by day.
+    """
+    conn = ctx.conn
+    attach_state_db(conn)
+
+    i = 0
+    while i < len(days):
+        mission_date, mission_squadron, checkpoint = days[i]
+        squadron_ids = {d[1] for d in days[i:]}
+        read = ctx.read(squadron_ids)  # re-copied after every write
+        active_player_id = get_active_player_id_light(read, mission_squadron, ctx.players)
+        if active_player_id:
+            if migrate_player_stats_by_description_if_needed(conn, active_player_id, ctx.carry) and read is not conn:
+                read = ctx.read(squadron_ids)
+            if not _migration_settled(conn, active_player_id, ctx.carry):
+                check_all_pilots_light(ctx, mission_squadron, mission_date, checkpoint=checkpoint)
+                i += 1
+                continue
+
+        j = i + 1
+        while j < len(days) and get_active_player_id_light(read, days[j][1], ctx.players) == active_player_id:
+            j += 1
+        _run_promotion_days(ctx, [d[0] for d in days[i:j]], active_player_id, checkpoint=days[j - 1][2],
+                            read=read)
+        i = j
+
+
+def _migration_settled(conn: sqlite3.Connection, pid: int, carry: CarryOverCache | None = None) -> bool:
+    """True if the description carry-over into pid can no longer happen (done or no predecessor)."""
+    if carry is not None:
+        return carry.is_settled(pid)  # filled by the migrate call that just ran
+    attach_state_db(conn)
+    if conn.execute(f"SELECT 1 FROM {MIGRATIONS_TABLE} WHERE newPilotId=? LIMIT 1", (pid,)).fetchone():
+        return True
+    return _find_previous_player_by_description(conn, pid) is None
+
+
+def _run_promotion_days(ctx: PassContext, mission_dates: List[str], active_player_id,
+                        checkpoint: Checkpoint | None = None,
+                        read: sqlite3.Connection | None = None) -> None:
+    """
+    Promotion passes for consecutive days sharing the active player: candidates are
+    evaluated once, then each day re-runs try_promote on those still eligible, carrying
+    ranks and attempt state in memory. With a checkpoint the player's writes commit first,
+    then the AI pilots in chunks; pilots an interrupted run already committed are left out.
+    Staging and evaluation run on 'read' (ctx.read()), which then keeps the fingerprints.
+    """
+    started = time.perf_counter()
+    conn, thresholds, squadrons = ctx.conn, ctx.thresholds, ctx.squadrons
+    key = pass_key(checkpoint) if checkpoint is not None else None
+    if read is None:
+        read = ctx.read([])
+
+    # Only changed pilots are staged; of those, ranks >=4 below the country ceiling
+    # that meet their threshold come back
+    stage_changed_pilots(read)
+    done = load_pass_cursor(conn, key) if key is not None else None
+    if done is not None:
+        # Committed by an interrupted run (the cursor exists once the player stage committed);
+        # unstaged, they keep their pre-pass fingerprints
+        log("[PASS] %s: resuming after pilot %s", mission_dates[-1], done)
+        read.execute(f"DELETE FROM {STAGED_PILOTS} WHERE id <= ? OR id = ?", (done, active_player_id))
+        read.commit()
+    replayed = replayed_promotions(conn, mission_dates)
+    if replayed:
+        warn("%s: %d pilots already promoted by an interrupted run; those days are not replayed",
+             mission_dates[-1], len(replayed))
+    eligible, scanned = ctx.evaluator(read, thresholds, ctx.max_ranks, source=STAGED_PILOTS)
+    if replayed:
+        # Evaluated for the later days, but their pre-pass fingerprints stay
+        read.executemany(f"DELETE FROM {STAGED_PILOTS} WHERE id = ?", [(pid,) for pid in replayed])
+        read.commit()
+
+    caps = {int(k): int(v) for k, v in ctx.max_ranks.items()}
+    state = PromotionStateStore.load(conn)
+    writes = PassWriteSet()
+    candidates = {row[0]: list(row) for row in eligible}
+    day_stats = [(mission_date, new_pass_stats()) for mission_date in mission_dates]
+    day_stats[0][1]["scanned"] = scanned
+
+    def simulate(rows: Dict[int, list], write_set: PassWriteSet) -> None:
+        for day_no, (mission_date, stats) in enumerate(day_stats):
+            if day_no:
+                stats["scanned"] += len(rows)
+            for pid in sorted(rows):
+                if mission_date <= replayed.get(pid, ""):
+                    continue  # staged with the rank that day's committed event gave it
+                row = rows[pid]
+                _, rank, pcp, sorties, good, pilot_sq = row
+                is_player = (pid == active_player_id)
+                new_rank = try_promote(conn, pid, rank, pcp, sorties, good, thresholds, mission_date,
+                                       is_player=is_player, stats=stats, write_set=write_set, state=state)
+
+                if new_rank != rank:
+                    # Queue a type=6 event
+                    write_set.add_event(pid, new_rank, mission_date)
+                    row[1] = new_rank
+                    if new_rank >= caps.get(squadrons.country(pilot_sq), DEFAULT_MAX_RANK):
+                        del rows[pid]
+                elif not is_player:
+                    del rows[pid]  # an AI pilot that did not promote is not eligible
+
+    def run(job, label: str) -> None:
+        if ctx.writer is not None:
+            ctx.writer.run(conn, job, label=label)
+        else:
+            job()
+
+    if key is not None and active_player_id in candidates:
+        # Stage 1: the player, the promotion someone is waiting to see in the game.
+        # AI pilots never roll, so taking the player out of id order keeps its rolls.
+        player_writes = PassWriteSet()
+        simulate({active_player_id: candidates.pop(active_player_id)}, player_writes)
+
+        def apply_player() -> None:
+            if conn.in_transaction:
+                conn.commit()
+            _apply_write_chunk(conn, player_writes, state, [active_player_id],
+                               remember_fingerprints=False, checkpoint=None, cursor=(key, 0))
+
+        try:
+            run(apply_player, f"player promotion {mission_dates[-1]}")
+            debug("[PASS] %s: player %s committed after %.1f ms", mission_dates[-1], active_player_id,
+                  (time.perf_counter() - started) * 1000.0)
+        except WriteDeferred:
+            log("[PASS] %s: player promotion queued until cp.db is free", mission_dates[-1])
+            raise
+
+    # Stage 2: the AI backlog (and the player when there is no checkpoint to resume from)
+    simulate(candidates, writes)
+
+    def apply() -> None:
+        apply_pass_writes(ctx, writes, state, remember_fingerprints=read is conn, checkpoint=checkpoint)
+        if read is not conn:
+            remember_staged_pilots(read.cursor())  # only after the pass committed on cp.db
+            read.commit()
+
+    deferred = None
+    try:
+        run(apply, f"promotion pass {mission_dates[-1]}")
+    except WriteDeferred as e:
+        log("[PASS] %s: writes queued until cp.db is free", mission_dates[-1])
+        deferred = e
+    if len(mission_dates) > 1:
+        log("[PASS] Coalesced %d days (%s … %s) into one write set",
+            len(mission_dates), mission_dates[0], mission_dates[-1])
+    for mission_date, stats in day_stats:
+        log_pass_summary(mission_date, active_player_id, stats, started)
+    if deferred is not None:
+        raise deferred
+
+
+def apply_pass_writes(ctx: PassContext, writes: PassWriteSet, state: PromotionStateStore | None = None,
+                      remember_fingerprints: bool = False, checkpoint: Checkpoint | None = None) -> None:
+    """
+    Apply a pass's rank updates, dirty attempt rows and type=6 events, plus the staged
+    fingerprints (remember_fingerprints) and 'checkpoint'. Without a checkpoint this is one
+    transaction; with one the pass is split by pilot id into resumable chunks that advance
+    rankmod.pass_cursor, and the fingerprints and checkpoint go with the last chunk.
+    """
+    conn = ctx.conn
+    if conn.in_transaction:
+        conn.commit()
+    if not writes and not (state and state.dirty) and checkpoint is None:
+        if remember_fingerprints:
+            remember_staged_pilots(conn.cursor())  # TEMP only: no write lock on cp.db
+            conn.commit()
+        return
+    if checkpoint is None:
+        _apply_write_chunk(conn, writes, state, None, remember_fingerprints, None)
+        return
+
+    # At most PASS_CHUNK_ROWS pilots per transaction with a pause in between so IL-2 gets
+    # the lock; a chunk that overruns PASS_CHUNK_MS halves the next one. Pilots at or below
+    # the cursor were committed by an interrupted run of this pass.
+    key = pass_key(checkpoint)
+    done = load_pass_cursor(conn, key)
+    pids = sorted(writes.pilot_ids() | (state.dirty if state is not None else set()))
+    if done is not None:
+        pids = [pid for pid in pids if pid > done]
+    size = max(1, int(PASS_CHUNK_ROWS))
+    pos = 0
+    while True:
+        chunk = pids[pos:pos + size]
+        pos += len(chunk)
+        final = pos >= len(pids)
+        part = writes if final and done is None and len(chunk) == len(pids) else writes.subset(chunk)
+        chunk_started = time.perf_counter()
+        _apply_write_chunk(conn, part, state, chunk,
+                           remember_fingerprints and final,
+                           checkpoint if final else None,
+                           cursor=(key, None if final else chunk[-1]))
+        if final:
+            return
+        if (time.perf_counter() - chunk_started) * 1000.0 > PASS_CHUNK_MS:
+            size = max(1, size // 2)
+        debug("[PASS] Committed pilots up to %s (%d left)", chunk[-1], len(pids) - pos)
+        time.sleep(PASS_CHUNK_PAUSE)
+
+
+def _apply_write_chunk(conn: sqlite3.Connection, writes: PassWriteSet,
+                       state: PromotionStateStore | None, pids,
+                       remember_fingerprints: bool,
+                       checkpoint: Checkpoint | None,
+                       cursor: Tuple[str, int | None] | None = None) -> None:
+    """
+    One transaction of apply_pass_writes; any failure rolls it back and re-raises. pids
+    limits the state rows written back (None: all dirty rows); cursor is (pass key, last
+    pilot id), a None id clears it. cp.db commits before the sidecar, so the promoted
+    pilots are journaled first (checkpoint.journal_pass).
+    """
+    cur = conn.cursor()
+    if writes.ranks:
+        journal_pass(conn, writes.ranks)
+    try:
+        # BEGIN IMMEDIATE only when cp.db itself is written; sidecar-only chunks never lock it
+        conn.execute("BEGIN IMMEDIATE" if writes.ranks or writes.events else "BEGIN")
+        ledger_record_journaled(cur)  # events an interrupted run of the pass left behind
+        clear_pass_journal(cur)
+        if remember_fingerprints:
+            remember_staged_pilots(cur)
+        writes.apply_pilot_writes(cur)
+        if state is not None:
+            state.write_back(cur, pids=pids)
+        insert_promotion_events(conn, writes.events, commit=False)
+        if checkpoint is not None:
+            save_checkpoint(cur, checkpoint)
+        if cursor is not None:
+            if cursor[1] is None:
+                clear_pass_cursor(cur)
+            else:
+                save_pass_cursor(cur, cursor[0], cursor[1])
+        conn.commit()
+        if state is not None:
+            state.mark_clean(pids)
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        if not is_busy_error(e):
+            error("Promotion pass rolled back (%s rank updates, %s events)",
+                  len(writes.ranks), len(writes.events))
+        raise
+
 
-        if new_rank != rank:
-            # Write a type=6 event
-            insert_promotion_event(conn, pid, new_rank, mission_date)
+def log_pass_summary(mission_date: str, active_player_id, stats: Dict[str, int], started: float) -> None:
+    elapsed_ms = (time.perf_counter() - started) * 1000.0
+    log("[PASS] %s: scanned=%d eligible=%d promoted=%d cooldown=%d failed_rolls=%d player=%s elapsed_ms=%.1f",
+        mission_date, stats["scanned"], stats["eligible"], stats["promoted"], stats["cooldown"],
+        stats["failed_rolls"], active_player_id, elapsed_ms,
+        event="pass_summary", date=mission_date, player=active_player_id,
+        elapsed_ms=round(elapsed_ms, 1), **stats)
 
 
-def monitor_db_light(db_path: str, thresholds, max_ranks: Dict[str, int], language: str) -> None:
+def monitor_db_light(db_path: str, thresholds, max_ranks: Dict[str, int], language: str,
+                     cfg: Dict[str, Any] | None = None) -> None:
     """
     Monitor Career DB and trigger promotion checks once per in-game day.
+    Polls on a persistent read-only connection; the writer connection is only
+    touched when a new mission has to be processed. Mission queries are skipped
+    entirely while cp.db is unchanged (PRAGMA data_version / file stat), and the
+    loop sleeps on a Career directory watcher that wakes it when the game writes.
     """
     last_mid = -1
     last_date = None
+    primed = False
     log(f"Opening DB: {db_path}")
-    while is_il2_running():
-        try:
-            conn = sqlite3.connect(db_path)
-            cur = conn.cursor()
-
-            # Build squadron→country map up front (cheap)
-            squadron_country = build_squadron_country_map(cur)
-
-            # Prime last mission/date on first loop
-            if last_mid == -1:
-                cur.execute("SELECT id, date FROM mission ORDER BY id DESC LIMIT 1")
-                row = cur.fetchone()
-                if row:
-                    last_mid = int(row[0])
-                    last_date = normalize_mission_date(str(row[1])) if row[1] else None
-                    log(f"Primed from latest mission: id={last_mid}, date={last_date}")
-                else:
-                    last_mid, last_date = -1, None
-                    log("No missions found yet. Waiting...")
-
-            # Check for new missions
-            cur.execute("SELECT id, date, squadronId FROM mission WHERE id > ? ORDER BY id ASC", (last_mid,))
-            for mid, date_str, squadron_id in cur.fetchall():
-                log(f"=== Mission Start: {mid} ({date_str}) ===")
-                last_mid = int(mid)
-                if date_str is None:
+    event_index = _cfg_flag((cfg or {}).get("EVENT_INDEX"))
+
+    def setup_writer(conn: sqlite3.Connection) -> None:
+        attach_state_db(conn)
+        if event_index:
+            ensure_event_index(conn)
+
+    db = ConnectionManager(db_path, pragmas=(cfg or {}).get("SQLITE_PRAGMAS"), on_writer_open=setup_writer)
+    changes = ChangeDetector(db_path)
+    watcher = open_career_watcher(db_path)
+    squadrons = SquadronCache()
+    writer = BusyRetryWriter()
+    snapshot_eval = _cfg_flag((cfg or {}).get("SNAPSHOT_EVAL"))
+    snapshot = EvaluationSnapshot(db_path, db.pragmas["busy_timeout"]) if snapshot_eval else None
+    ctx = PassContext(None, thresholds, max_ranks, language, squadrons,
+                      select_evaluator((cfg or {}).get("EVALUATOR")), ActivePlayerResolver(), CarryOverCache(),
+                      writer, snapshot)
+    try:
+        while is_il2_running():
+            try:
+                # A queued pass write goes first; new missions wait until it commits
+                if writer.pending:
+                    if not writer.retry_pending():
+                        watcher.wait(writer.next_retry_in())
+                        continue
+                    cp = load_checkpoint(db.writer())
+                    if cp is not None:
+                        last_mid, last_date = cp.mission_id, cp.date
+                    changes.reset()  # re-check missions after the queued pass
+
+                reader = db.reader()
+                if not changes.changed(reader):
+                    watcher.wait(WATCH_IDLE_TIMEOUT)
                     continue
+                cur = reader.cursor()
+
+                # Resume from the stored checkpoint, or prime from the latest mission
+                if not primed:
+                    last_mid, last_date = resume_or_prime(db, reader)
+                    primed = True
+
+                # Check for new missions
+                cur.execute("SELECT id, date, squadronId FROM mission WHERE id > ? ORDER BY id ASC", (last_mid,))
+                new_missions = cur.fetchall()
+                if not new_missions:
+                    watcher.wait(WATCH_IDLE_TIMEOUT)
+                    continue
+                ctx.conn = db.writer()
+                squadrons.refresh(ctx.conn)
+
+                # A pass interrupted between chunks is finished first, over the same missions
+                end = pending_pass_end(ctx.conn)
+                if end is not None and end > last_mid:
+                    new_missions = [m for m in new_missions if m[0] <= end] or new_missions
+
+                # One entry per new in-game day, keyed by its first mission; each entry
+                # carries the checkpoint of the last mission before the next day starts
+                days = []
+                day = last_date
+                for mid, date_str, squadron_id in new_missions:
+                    log(f"=== Mission Start: {mid} ({date_str}) ===")
+                    if date_str is not None:
+                        current_date = normalize_mission_date(str(date_str))
+                        if current_date != day:
+                            day = current_date
+                            days.append([current_date, squadron_id, None])
+                    cp = Checkpoint(int(mid), day, mission_fingerprint(date_str, squadron_id))
+                    if days:
+                        days[-1][2] = cp
+
+                # Note: campaign_country not needed for light flow
+                # Run the promotion pass once per new in-game day; a backlog of several
+                # days is simulated together and written once
+                if len(days) == 1:
+                    check_all_pilots_light(ctx, mission_squadron=days[0][1], mission_date=days[0][0],
+                                           checkpoint=days[0][2])
+                elif days:
+                    check_backlog_light(ctx, [tuple(d) for d in days])
+                if not days:
+                    # Only missions on an already processed day (or without a date)
+                    write_checkpoint(ctx.conn, cp)
+                last_mid, last_date = cp.mission_id, cp.date
+
+            except WriteDeferred:
+                # Missions stay unprocessed (last_mid not advanced) until the queued write commits
+                continue
+            except Exception as e:
+                error("monitor_db_light: %s", e)
+                writer.clear()
+                db.reset()
+                changes.reset()
+                squadrons.invalidate()
+                ctx.players.invalidate()
+                ctx.carry.invalidate()
+                if snapshot is not None:
+                    snapshot.close()
+                time.sleep(POLL_INTERVAL)
+                continue
+
+            watcher.wait(WATCH_IDLE_TIMEOUT)
+    finally:
+        c = writer.counters
+        if c["busy"] or writer.pending:
+            log("[DB] Writer: writes=%d busy=%d retries=%d deferred=%d wait_ms=%.0f pending=%d",
+                c["writes"], c["busy"], c["retries"], c["deferred"], c["wait_ms"], len(writer.pending))
+        watcher.close()
+        db.close()
+        if snapshot is not None:
+            snapshot.close()
 
-                current_date = normalize_mission_date(str(date_str))
-
-                if current_date != last_date:
-                    last_date = current_date
-                    # Note: campaign_country not needed for light flow
-                    # Run the promotion pass once per new in-game day
-                    check_all_pilots_light(conn, thresholds, max_ranks, language,
-                                           mission_squadron=squadron_id,
-                                           squadron_country_map=squadron_country,
-                                           mission_date=last_date)
-
-        except Exception as e:
-            log(f"[ERROR] monitor_db_light: {e}")
-        finally:
-            try:
-                conn.close()
-            except Exception:
-                pass
 
-        time.sleep(POLL_INTERVAL)
+def resume_or_prime(db: ConnectionManager, reader: sqlite3.Connection) -> Tuple[int, str | None]:
+    """
+    (last mission id, last day) to continue from. A stored checkpoint that still matches
+    its mission row is resumed, so missions written while the checker was down are
+    processed; otherwise prime from the latest mission and store that as the checkpoint.
+    """
+    cp = load_checkpoint(db.writer())
+    if cp is not None and checkpoint_matches(reader, cp):
+        log(f"Resuming from checkpoint: id={cp.mission_id}, date={cp.date}")
+        return cp.mission_id, cp.date
+    if cp is not None:
+        warn("Checkpoint mission %s no longer matches this career; re-priming", cp.mission_id)
+
+    row = reader.execute("SELECT id, date, squadronId FROM mission ORDER BY id DESC LIMIT 1").fetchone()
+    if row:
+        last_date = normalize_mission_date(str(row[1])) if row[1] else None
+        cp = Checkpoint(int(row[0]), last_date, mission_fingerprint(row[1], row[2]))
+        log(f"Primed from latest mission: id={cp.mission_id}, date={last_date}")
+    else:
+        cp = Checkpoint(0, None, None)
+        log("No missions found yet. Waiting...")
+    write_checkpoint(db.writer(), cp)
+    return cp.mission_id, cp.date
+
+
+def write_checkpoint(conn: sqlite3.Connection, cp: Checkpoint) -> None:
+    """Save the checkpoint on its own (no promotion pass to piggyback on)."""
+    attach_state_db(conn)
+    if conn.in_transaction:
+        conn.commit()
+    try:
+        save_checkpoint(conn.cursor(), cp)
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
 
 
 EXCLUDE_PILOT_COLS = {
@@ -815,26 +1189,6 @@ EXCLUDE_PILOT_COLS = {
     "isDeleted",
 }
 
-def _ensure_migration_table(conn: sqlite3.Connection) -> None:
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS rankmod_player_migrations (
-            oldPilotId INTEGER,
-            newPilotId INTEGER PRIMARY KEY,
-            migratedOn TEXT
-        )
-    """)
-
-def _pilot_columns(conn: sqlite3.Connection) -> list[str]:
-    cur = conn.cursor()
-    return [row[1] for row in cur.execute("PRAGMA table_info(pilot)") if row and row[1]]
-
-def _row_as_dict(cur: sqlite3.Cursor, sql: str, params: tuple) -> dict | None:
-    cur.execute(sql, params)
-    row = cur.fetchone()
-    if not row:
-        return None
-    return {d[0]: row[i] for i, d in enumerate(cur.description)}
-
 def _find_previous_player_by_description(conn: sqlite3.Connection, new_pid: int) -> int | None:
     """
     Find the previous player pilot row as:
@@ -870,40 +1224,61 @@ def _find_previous_player_by_description(conn: sqlite3.Connection, new_pid: int)
 
     return int(row[0]) if row else None
 
-def migrate_player_stats_by_description_if_needed(conn: sqlite3.Connection, new_pid: int) -> bool:
+def migrate_player_stats_by_description_if_needed(conn: sqlite3.Connection, new_pid: int,
+                                                 carry: CarryOverCache | None = None) -> bool:
     """
     Overwrite ALL pilot columns from the previous player row into the new player row,
     except the explicit excluded identity/campaign columns in EXCLUDE_PILOT_COLS.
 
     Uses player.description (exact match) and "closest lower id" to identify old player.
-    Runs only once per new_pid (marker table rankmod_player_migrations).
+    Runs only once per new_pid (marker table MIGRATIONS_TABLE in the mod state database).
+    With 'carry' (CarryOverCache) a settled player costs no query, one without a
+    predecessor only a PRAGMA data_version.
     """
-    _ensure_migration_table(conn)
+    if carry is not None:
+        carry.bind(conn)
+        if new_pid in carry.settled:
+            return False
+        old_pid = carry.previous_player(conn, new_pid)
+        if not old_pid:
+            carry.unmatched.add(new_pid)
+            return False
+    attach_state_db(conn)
 
     # idempotency: do not migrate twice into the same new player id
     if conn.execute(
-        "SELECT 1 FROM rankmod_player_migrations WHERE newPilotId=? LIMIT 1",
+        f"SELECT 1 FROM {MIGRATIONS_TABLE} WHERE newPilotId=? LIMIT 1",
         (new_pid,)
     ).fetchone():
+        if carry is not None:
+            carry.settled.add(new_pid)
         return False
 
-    old_pid = _find_previous_player_by_description(conn, new_pid)
-    if not old_pid:
-        return False
+    if carry is None:
+        old_pid = _find_previous_player_by_description(conn, new_pid)
+        if not old_pid:
+            return False
 
     cur = conn.cursor()
-    new_row = _row_as_dict(cur, "SELECT * FROM pilot WHERE id=? AND isDeleted=0", (new_pid,))
-    old_row = _row_as_dict(cur, "SELECT * FROM pilot WHERE id=? AND isDeleted=0", (old_pid,))
+    rows = {}
+    cur.execute("SELECT * FROM pilot WHERE id IN (?, ?) AND isDeleted=0", (new_pid, old_pid))
+    names = [d[0] for d in cur.description]
+    for row in cur.fetchall():
+        rec = dict(zip(names, row))
+        rows[rec["id"]] = rec
+    new_row, old_row = rows.get(new_pid), rows.get(old_pid)
     if not new_row or not old_row:
         return False
 
-    cols = _pilot_columns(conn)
+    cols = carry.pilot_columns(conn) if carry is not None else pilot_columns(conn)
     copy_cols = [c for c in cols if c not in EXCLUDE_PILOT_COLS]
     if not copy_cols:
         return False
 
     # Only migrate if anything differs (per your requirement)
     if not any(old_row.get(c) != new_row.get(c) for c in copy_cols):
+        if carry is not None:
+            carry.settled.add(new_pid)
         return False
 
     set_clause = ", ".join([f"{c}=?" for c in copy_cols])
@@ -916,10 +1291,10 @@ def migrate_player_stats_by_description_if_needed(conn: sqlite3.Connection, new_
         cur.execute(f"UPDATE pilot SET {set_clause} WHERE id=?", tuple(values))
 
         # Optional but recommended: carry over mod tracking state
-        cur.execute("""
-            INSERT INTO promotion_attempts (pilotId, last_attempt, last_success, fail_count)
+        cur.execute(f"""
+            INSERT INTO {ATTEMPTS_TABLE} (pilotId, last_attempt, last_success, fail_count)
             SELECT ?, last_attempt, last_success, fail_count
-            FROM promotion_attempts
+            FROM {ATTEMPTS_TABLE}
             WHERE pilotId=?
             ON CONFLICT(pilotId) DO UPDATE SET
                 last_attempt=excluded.last_attempt,
@@ -928,12 +1303,14 @@ def migrate_player_stats_by_description_if_needed(conn: sqlite3.Connection, new_
         """, (new_pid, old_pid))
 
         # Mark as done
-        cur.execute("""
-            INSERT INTO rankmod_player_migrations (oldPilotId, newPilotId, migratedOn)
+        cur.execute(f"""
+            INSERT INTO {MIGRATIONS_TABLE} (oldPilotId, newPilotId, migratedOn)
             VALUES (?, ?, datetime('now'))
         """, (old_pid, new_pid))
 
         conn.commit()
+        if carry is not None:
+            carry.settled.add(new_pid)
         log(f"[MIGRATE] Player carry-over: copied stats oldPid={old_pid} → newPid={new_pid} "
             f"(excluded={sorted(EXCLUDE_PILOT_COLS)})")
         return True
@@ -943,21 +1320,21 @@ def migrate_player_stats_by_description_if_needed(conn: sqlite3.Connection, new_
             conn.rollback()
         except Exception:
             pass
-        log(f"[MIGRATE][ERROR] Failed carry-over oldPid={old_pid} → newPid={new_pid}: {e}")
+        error("[MIGRATE] Failed carry-over oldPid=%s → newPid=%s: %s", old_pid, new_pid, e)
         return False
 
 def update_personage_max_rank(db_path: str):
+    conn = None
     try:
         conn = sqlite3.connect(db_path)
-        cur = conn.cursor()
-        cur.execute("UPDATE personage SET maxRank=13")
-        conn.commit()
-        log("[INIT] Set personage.maxRank=13 for all rows")
+        changed = raise_personage_max_rank(conn)
+        log("[INIT] Set personage.maxRank=%s on %s rows below it", PERSONAGE_MAX_RANK, changed)
     except Exception as e:
-        log(f"[WARN] Could not update personage.maxRank: {e}")
+        warn("Could not update personage.maxRank: %s", e)
     finally:
         try:
-            conn.close()
+            if conn is not None:
+                conn.close()
         except Exception:
             pass
 
@@ -987,6 +1364,7 @@ def main():
 
     # point the logger explicitly (just in case)
     config.LOG_FILE = os.path.join(cfg['game_path'], 'data', 'Career', 'promotion_debug.log')
+    logger.configure(cfg)
 
     log(f"[START] Rank Mod Light starting with game_path={cfg['game_path']}")
 
@@ -1003,14 +1381,15 @@ def main():
     acquire_installation_lock(os.path.join(cfg['game_path'], 'data', 'Career'))
     set_promotion_config(cfg)
     update_personage_max_rank(db_path_from_config(cfg))
+    maintenance = MaintenanceScheduler(db_path)
 
     log("Waiting for IL-2 to start…")
 
     while True:
-        while not is_il2_running():
-            time.sleep(POLL_INTERVAL)
-        log("IL-2 detected. Starting monitor…")
-        monitor_db_light(db_path, thresholds, max_ranks, language)
+        # housekeeping runs between process scans, i.e. only while IL-2 is closed
+        pid = wait_for_il2(idle=maintenance.run_due)
+        log(f"IL-2 detected (pid={pid}). Starting monitor…")
+        monitor_db_light(db_path, thresholds, max_ranks, language, cfg)
         log("IL-2 closed. Monitoring will restart on next launch.")
 
 
@@ -1020,7 +1399,7 @@ if __name__ == "__main__":
     except Exception as e:
         # make sure it goes to the Career log
         try:
-            log(f"[FATAL] {e}")
+            error("Fatal: %s", e)
         except Exception:
             pass
         # silent exit (no popups)
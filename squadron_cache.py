@@ -0,0 +1,42 @@
+"""
+squadron_cache.py
+
+In-memory map of squadron.id to its country (configID // 1000).
+
+The table is only re-read when its (row count, max id) signature moves, and the monitor
+only asks for that signature after cp.db has changed, so steady-state lookups are dict hits.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from typing import Dict
+
+from logger import debug
+
+DEFAULT_COUNTRY = 201
+
+
+class SquadronCache:
+    def __init__(self):
+        self._countries: Dict[int, int] = {}
+        self._signature = None
+
+    def refresh(self, conn: sqlite3.Connection, force: bool = False) -> bool:
+        """Rebuild from the squadron table if its signature changed. Returns True if rebuilt."""
+        sig = tuple(conn.execute("SELECT COUNT(*), MAX(id) FROM squadron").fetchone())
+        if sig == self._signature and not force:
+            return False
+        countries = {}
+        for sq_id, config_id in conn.execute("SELECT id, configID FROM squadron"):
+            if config_id is not None:
+                countries[sq_id] = int(config_id) // 1000  # configId // 1000 yields the country code
+        self._countries, self._signature = countries, sig
+        debug("[CACHE] Squadron metadata rebuilt: %s rows", len(countries))
+        return True
+
+    def invalidate(self) -> None:
+        self._signature = None
+
+    def country(self, squadron_id, default: int = DEFAULT_COUNTRY) -> int:
+        return self._countries.get(squadron_id, default)
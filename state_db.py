@@ -0,0 +1,220 @@
+"""
+state_db.py
+
+The mod's own bookkeeping lives in a sidecar SQLite file next to cp.db
+(data/Career/rankmod_state.db), attached to the writer connection as schema 'rankmod':
+
+- rankmod.promotion_attempts   player cooldown / fail tracking
+- rankmod.player_migrations    description carry-over markers
+- rankmod.checkpoint           last processed mission (see checkpoint.py)
+- rankmod.pass_journal         pilots a pass is writing to cp.db (see checkpoint.py)
+- rankmod.promotion_event_ledger  (pilotId, rankId, date) of every type=6 event we
+                               wrote, with its event rowid (see event_ledger.py)
+- rankmod.pass_cursor          progress of a promotion pass applied in chunks
+- rankmod.maintenance          last run of each idle-time maintenance job (maintenance.py)
+- rankmod.meta                 one-time import / seed markers
+
+The sidecar runs in WAL mode with synchronous=NORMAL, so a transaction that only writes
+the sidecar never takes the game's cp.db lock; only pilot.rankId, event and personage
+are written to cp.db. With a WAL database involved SQLite commits the two files one after
+the other, not atomically: a crash in between keeps the cp.db half (rankmod.pass_journal).
+Older versions kept the tables inside cp.db; they are copied over once (import_legacy_tables)
+and left in place.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+from typing import Optional
+
+from logger import log, warn
+
+STATE_DB_NAME = "rankmod_state.db"
+STATE_SCHEMA = "rankmod"
+
+ATTEMPTS_TABLE = f"{STATE_SCHEMA}.promotion_attempts"
+MIGRATIONS_TABLE = f"{STATE_SCHEMA}.player_migrations"
+CHECKPOINT_TABLE = f"{STATE_SCHEMA}.checkpoint"
+JOURNAL_TABLE = f"{STATE_SCHEMA}.pass_journal"
+EVENT_LEDGER_TABLE = f"{STATE_SCHEMA}.promotion_event_ledger"
+PASS_CURSOR_TABLE = f"{STATE_SCHEMA}.pass_cursor"
+MAINTENANCE_TABLE = f"{STATE_SCHEMA}.maintenance"
+META_TABLE = f"{STATE_SCHEMA}.meta"
+
+# legacy cp.db table -> sidecar table; columns are identical
+_LEGACY_TABLES = {
+    "promotion_attempts": ATTEMPTS_TABLE,
+    "rankmod_player_migrations": MIGRATIONS_TABLE,
+}
+_IMPORT_MARKER = "legacy_import_done"
+_LEDGER_MARKER = "event_ledger_seeded"
+
+
+def state_db_path(db_path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)), STATE_DB_NAME)
+
+
+def _main_db_path(conn: sqlite3.Connection) -> Optional[str]:
+    for _, name, path in conn.execute("PRAGMA database_list"):
+        if name == "main":
+            return path or None
+    return None
+
+
+def is_attached(conn: sqlite3.Connection) -> bool:
+    return any(row[1] == STATE_SCHEMA for row in conn.execute("PRAGMA database_list"))
+
+
+def ensure_state_schema(conn: sqlite3.Connection) -> None:
+    """Create the sidecar tables if missing (the sidecar must already be attached)."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ATTEMPTS_TABLE} (
+            pilotId INTEGER PRIMARY KEY,
+            last_attempt TEXT,
+            last_success INTEGER,
+            fail_count INTEGER DEFAULT 0
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+            oldPilotId INTEGER,
+            newPilotId INTEGER PRIMARY KEY,
+            migratedOn TEXT
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            missionId INTEGER NOT NULL,
+            date TEXT,
+            fingerprint TEXT,
+            updatedOn TEXT
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {JOURNAL_TABLE} (
+            pilotId INTEGER PRIMARY KEY,
+            eventRowid INTEGER NOT NULL
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {EVENT_LEDGER_TABLE} (
+            pilotId INTEGER NOT NULL,
+            rankId INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            eventRowid INTEGER,
+            PRIMARY KEY (pilotId, rankId, date)
+        ) WITHOUT ROWID
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {PASS_CURSOR_TABLE} (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            passKey TEXT NOT NULL,
+            lastPilotId INTEGER NOT NULL
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {MAINTENANCE_TABLE} (
+            job TEXT PRIMARY KEY,
+            lastRun REAL NOT NULL,
+            rows INTEGER,
+            ranOn TEXT
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {META_TABLE} (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    """)
+
+
+def import_legacy_tables(conn: sqlite3.Connection) -> int:
+    """
+    Copy the mod tables an older version created inside cp.db into the sidecar, once.
+    Rows already present in the sidecar win. Returns the number of rows copied.
+    """
+    if conn.execute(f"SELECT 1 FROM {META_TABLE} WHERE key = ?", (_IMPORT_MARKER,)).fetchone():
+        return 0
+    existing = {
+        row[0] for row in conn.execute("SELECT name FROM main.sqlite_master WHERE type = 'table'")
+    }
+    copied = 0
+    try:
+        conn.execute("BEGIN")
+        for legacy, target in _LEGACY_TABLES.items():
+            if legacy in existing:
+                cur = conn.execute(f"INSERT OR IGNORE INTO {target} SELECT * FROM main.{legacy}")
+                copied += max(0, cur.rowcount)
+        conn.execute(
+            f"INSERT OR REPLACE INTO {META_TABLE} (key, value) VALUES (?, datetime('now'))",
+            (_IMPORT_MARKER,),
+        )
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    if copied:
+        log("[STATE] Imported %s rows of mod state from cp.db into %s", copied, STATE_DB_NAME)
+    return copied
+
+
+def seed_event_ledger(conn: sqlite3.Connection) -> int:
+    """
+    Fill the event ledger once from the type=6 events (missionId=-1) already in cp.db.
+    This is the only full scan of event; afterwards the ledger is kept by each insert.
+    Returns the number of rows seeded.
+    """
+    if conn.execute(f"SELECT 1 FROM {META_TABLE} WHERE key = ?", (_LEDGER_MARKER,)).fetchone():
+        return 0
+    try:
+        conn.execute("BEGIN")
+        cur = conn.execute(f"""
+            INSERT OR IGNORE INTO {EVENT_LEDGER_TABLE} (pilotId, rankId, date, eventRowid)
+            SELECT pilotId, rankId, date, rowid FROM main.event
+            WHERE type = 6 AND missionId = -1
+              AND pilotId IS NOT NULL AND rankId IS NOT NULL AND date IS NOT NULL
+        """)
+        seeded = max(0, cur.rowcount)
+        conn.execute(
+            f"INSERT OR REPLACE INTO {META_TABLE} (key, value) VALUES (?, datetime('now'))",
+            (_LEDGER_MARKER,),
+        )
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    log("[STATE] Promotion event ledger seeded with %s existing events", seeded)
+    return seeded
+
+
+def attach_state_db(conn: sqlite3.Connection) -> None:
+    """
+    Attach the sidecar next to conn's main database as 'rankmod', tune it, create the
+    tables and run the one-time legacy import and ledger seed. Safe to call again on
+    the same connection. Transactions spanning main and 'rankmod' are atomic per file
+    only (module docstring).
+    """
+    if is_attached(conn):
+        return
+    main_path = _main_db_path(conn)
+    if not main_path:
+        raise sqlite3.OperationalError("cannot attach mod state to an in-memory database")
+    if conn.in_transaction:
+        conn.commit()  # ATTACH is not allowed inside a transaction
+    conn.execute(f"ATTACH DATABASE ? AS {STATE_SCHEMA}", (state_db_path(main_path),))
+    try:
+        conn.execute(f"PRAGMA {STATE_SCHEMA}.journal_mode=WAL").fetchone()
+        conn.execute(f"PRAGMA {STATE_SCHEMA}.synchronous=NORMAL")
+    except sqlite3.DatabaseError as e:
+        warn("Could not tune %s: %s", STATE_DB_NAME, e)
+    ensure_state_schema(conn)
+    import_legacy_tables(conn)
+    seed_event_ledger(conn)
@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# The modules live at the repository root and import each other by plain name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config  # noqa: E402
+from state_db import state_db_path  # noqa: E402
+
+PLAYER_ID = 30
+SQUADRON_CONFIGS = {1: 101001, 2: 102002, 3: 201003}
+
+
+@pytest.fixture(autouse=True)
+def _log_to_tmp(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "LOG_FILE", str(tmp_path / "promotion_debug.log"))
+
+
+def build_cpdb(path: str, n_pilots: int = PLAYER_ID, n_missions: int = 3) -> str:
+    """
+    A minimal cp.db: AI pilots that always meet their threshold, one player (PLAYER_ID) in squadron 1.
+    The sidecar lives next to cp.db, so tests that need several databases put each in its own directory.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE squadron(id INTEGER PRIMARY KEY, configID INTEGER, careerId INTEGER);
+        CREATE TABLE pilot(id INTEGER PRIMARY KEY, squadronId INTEGER, name TEXT, lastName TEXT, birthDay TEXT,
+            description TEXT, commonStat TEXT, personageId TEXT, avatarPath TEXT, AILevel INTEGER, insDate TEXT,
+            isDeleted INTEGER, rankId INTEGER, pcp REAL, sorties INTEGER, goodSorties INTEGER, score INTEGER);
+        CREATE TABLE mission(id INTEGER PRIMARY KEY, date TEXT, squadronId INTEGER);
+        CREATE TABLE event(id INTEGER PRIMARY KEY, date TEXT, type INTEGER, pilotId INTEGER, rankId INTEGER,
+            missionId INTEGER, squadronId INTEGER, careerId INTEGER, ipar1 INTEGER, ipar2 INTEGER, ipar3 INTEGER,
+            ipar4 INTEGER, tpar1 TEXT, tpar2 TEXT, tpar3 TEXT, tpar4 TEXT, isDeleted INTEGER);
+        CREATE TABLE personage(id INTEGER PRIMARY KEY, maxRank INTEGER);
+    """)
+    conn.executemany("INSERT INTO squadron VALUES (?, ?, 1)", SQUADRON_CONFIGS.items())
+    conn.executemany(
+        "INSERT INTO pilot (id, squadronId, name, lastName, description, personageId, isDeleted, rankId,"
+        " pcp, sorties, goodSorties, score) VALUES (?, ?, ?, ?, '', '', 0, ?, 1000, 0, 0, 0)",
+        [(pid, 1 + pid % 3, "N%d" % pid, "L%d" % pid, 4 + pid % 5) for pid in range(1, n_pilots + 1)],
+    )
+    conn.execute("UPDATE pilot SET personageId='p1', squadronId=1, rankId=5, description='hero' WHERE id=?",
+                 (n_pilots,))
+    for m in range(1, n_missions + 1):
+        conn.execute("INSERT INTO mission VALUES (?, ?, 1)", (m, "1942-01-%02d 10:00:00" % m))
+        conn.execute("INSERT INTO event (date, type, pilotId, rankId, missionId, isDeleted)"
+                     " VALUES ('1942-01-%02d 10:00:00', 1, ?, 5, ?, 0)" % m, (n_pilots, m))
+    conn.execute("INSERT INTO personage VALUES (1, 5)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def cpdb(tmp_path):
+    return build_cpdb(str(tmp_path / "cp.db"))
+
+
+def ranks(path: str) -> dict:
+    conn = sqlite3.connect(path)
+    try:
+        return dict(conn.execute("SELECT id, rankId FROM pilot"))
+    finally:
+        conn.close()
+
+
+def promotion_events(path: str) -> list:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT pilotId, rankId FROM event WHERE type=6 ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def attempts(path: str) -> list:
+    """promotion_attempts rows from the mod's sidecar next to cp.db at 'path'."""
+    conn = sqlite3.connect(state_db_path(path))
+    try:
+        return conn.execute("SELECT * FROM promotion_attempts ORDER BY pilotId").fetchall()
+    finally:
+        conn.close()
@@ -0,0 +1,80 @@
+import random
+import sqlite3
+
+import pytest
+
+import rank_promotion_checker_light as checker
+from conftest import build_cpdb, promotion_events, ranks
+from db import BusyRetryWriter, WriteDeferred
+from squadron_cache import SquadronCache
+from state_db import attach_state_db
+
+DATE = "1942.01.03"
+
+
+def _context(conn, writer):
+    squadrons = SquadronCache()
+    squadrons.refresh(conn)
+    return checker.PassContext(conn, checker.DEFAULT_THRESHOLDS, checker.DEFAULT_MAX_RANKS, "en", squadrons,
+                               writer=writer)
+
+
+def _writer(sleep=lambda delay: None):
+    return BusyRetryWriter(busy_timeout_ms=0, attempts=3, base_delay=0.0, sleep=sleep)
+
+
+def _game_lock(path):
+    """IL-2 holding cp.db's write lock."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("BEGIN IMMEDIATE")
+    return conn
+
+
+def _expected(tmp_path, monkeypatch):
+    path = build_cpdb(str(tmp_path / "clean" / "cp.db"))
+    monkeypatch.setattr(random, "random", lambda: 0.0)
+    conn = sqlite3.connect(path)
+    checker.check_all_pilots_light(_context(conn, None), 1, DATE)
+    conn.close()
+    return ranks(path), promotion_events(path)
+
+
+@pytest.fixture
+def writer_conn(cpdb):
+    conn = sqlite3.connect(cpdb)
+    attach_state_db(conn)
+    conn.execute("PRAGMA busy_timeout=2000")
+    yield conn
+    conn.close()
+
+
+def test_lock_released_during_backoff_commits_on_retry(cpdb, writer_conn, tmp_path, monkeypatch):
+    expected = _expected(tmp_path, monkeypatch)
+    game = _game_lock(cpdb)
+    writer = _writer(sleep=lambda delay: game.rollback())
+    checker.check_all_pilots_light(_context(writer_conn, writer), 1, DATE)
+    game.close()
+
+    assert (ranks(cpdb), promotion_events(cpdb)) == expected
+    assert writer.counters["busy"] == 1 and writer.counters["retries"] == 1
+    assert writer.counters["deferred"] == 0 and not writer.pending
+    assert writer_conn.execute("PRAGMA busy_timeout").fetchone()[0] == 2000
+
+
+def test_held_lock_defers_the_pass_until_it_is_released(cpdb, writer_conn, tmp_path, monkeypatch):
+    expected = _expected(tmp_path, monkeypatch)
+    before = ranks(cpdb)
+    game = _game_lock(cpdb)
+    writer = _writer()
+    with pytest.raises(WriteDeferred):
+        checker.check_all_pilots_light(_context(writer_conn, writer), 1, DATE)
+    assert writer.counters["busy"] == 3 and writer.counters["deferred"] == 1
+    assert len(writer.pending) == 1
+    assert ranks(cpdb) == before and promotion_events(cpdb) == []
+    assert writer_conn.execute("PRAGMA busy_timeout").fetchone()[0] == 2000
+
+    assert not writer.retry_pending()  # still held
+    game.rollback()
+    game.close()
+    assert writer.retry_pending()
+    assert (ranks(cpdb), promotion_events(cpdb)) == expected
@@ -0,0 +1,67 @@
+import sqlite3
+
+import rank_promotion_checker_light as checker
+from carry_over import CarryOverCache
+from conftest import PLAYER_ID
+from state_db import attach_state_db
+
+NEW_PLAYER = PLAYER_ID + 1
+
+
+def _writer(path):
+    conn = sqlite3.connect(path)
+    attach_state_db(conn)
+    return conn
+
+
+def _game(path, sql, *params):
+    """A write committed by the game from its own connection."""
+    conn = sqlite3.connect(path)
+    conn.execute(sql, params)
+    conn.commit()
+    conn.close()
+
+
+def _add_successor(path, pcp, description="hero"):
+    """The game starting a new career for the same character."""
+    _game(path, "INSERT INTO pilot (id, squadronId, name, lastName, description, personageId, isDeleted, rankId,"
+                " pcp, sorties, goodSorties, score)"
+                " SELECT ?, squadronId, name, lastName, ?, personageId, 0, rankId, ?, sorties, goodSorties, score"
+                " FROM pilot WHERE id = ?", NEW_PLAYER, description, pcp, PLAYER_ID)
+
+
+def test_successor_committed_by_the_game_is_found(cpdb):
+    conn = _writer(cpdb)
+    carry = CarryOverCache()
+    assert not checker.migrate_player_stats_by_description_if_needed(conn, PLAYER_ID, carry)
+    assert carry.is_settled(PLAYER_ID)  # no predecessor
+
+    _add_successor(cpdb, pcp=0)
+    assert checker.migrate_player_stats_by_description_if_needed(conn, NEW_PLAYER, carry)
+    assert conn.execute("SELECT pcp FROM pilot WHERE id = ?", (NEW_PLAYER,)).fetchone()[0] == 1000
+    assert NEW_PLAYER in carry.settled
+    conn.close()
+
+
+def test_identical_successor_is_settled_without_a_migration(cpdb):
+    _add_successor(cpdb, pcp=1000)
+    conn = _writer(cpdb)
+    carry = CarryOverCache()
+    assert not checker.migrate_player_stats_by_description_if_needed(conn, NEW_PLAYER, carry)
+    assert NEW_PLAYER in carry.settled
+    assert checker._migration_settled(conn, NEW_PLAYER, carry)
+    conn.close()
+
+
+def test_description_set_later_by_the_game_is_seen(cpdb):
+    # Same pilot count and max id as when the map was built; only data_version moves
+    _add_successor(cpdb, pcp=0, description="")
+    conn = _writer(cpdb)
+    carry = CarryOverCache()
+    assert not checker.migrate_player_stats_by_description_if_needed(conn, NEW_PLAYER, carry)
+    assert carry.is_settled(NEW_PLAYER)
+
+    _game(cpdb, "UPDATE pilot SET description = 'hero' WHERE id = ?", NEW_PLAYER)
+    assert checker.migrate_player_stats_by_description_if_needed(conn, NEW_PLAYER, carry)
+    assert conn.execute("SELECT pcp FROM pilot WHERE id = ?", (NEW_PLAYER,)).fetchone()[0] == 1000
+    conn.close()
@@ -0,0 +1,80 @@
+import random
+import sqlite3
+
+import pytest
+
+import rank_promotion_checker_light as checker
+from checkpoint import Checkpoint, load_checkpoint, mission_fingerprint
+from db import ConnectionManager
+from squadron_cache import SquadronCache
+from state_db import attach_state_db
+
+
+def _add_mission(path, mid, date):
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO mission VALUES (?, ?, 1)", (mid, date))
+    conn.commit()
+    conn.close()
+
+
+def _resume(path):
+    db = ConnectionManager(path, on_writer_open=attach_state_db)
+    try:
+        return checker.resume_or_prime(db, db.reader())
+    finally:
+        db.close()
+
+
+def _pass_with_checkpoint(path, mid, date):
+    conn = sqlite3.connect(path)
+    squadrons = SquadronCache()
+    squadrons.refresh(conn)
+    ctx = checker.PassContext(conn, checker.DEFAULT_THRESHOLDS, checker.DEFAULT_MAX_RANKS, "en", squadrons)
+    cp = Checkpoint(mid, checker.normalize_mission_date(date), mission_fingerprint(date, 1))
+    try:
+        checker.check_all_pilots_light(ctx, 1, date, checkpoint=cp)
+    finally:
+        conn.close()
+
+
+@pytest.fixture(autouse=True)
+def _player_always_promoted(monkeypatch):
+    monkeypatch.setattr(random, "random", lambda: 0.0)
+
+
+def test_first_start_primes_from_latest_mission(cpdb):
+    assert _resume(cpdb) == (3, "1942.01.03")
+    conn = sqlite3.connect(cpdb)
+    attach_state_db(conn)
+    assert load_checkpoint(conn).mission_id == 3
+    conn.close()
+
+
+def test_restart_resumes_after_last_committed_pass(cpdb):
+    _resume(cpdb)
+    _add_mission(cpdb, 4, "1942-01-04 10:00:00")
+    _pass_with_checkpoint(cpdb, 4, "1942-01-04 10:00:00")
+    _add_mission(cpdb, 5, "1942-01-05 10:00:00")  # written while the checker was down
+    assert _resume(cpdb) == (4, "1942.01.04")
+
+
+def test_rolled_back_pass_keeps_the_previous_checkpoint(cpdb, monkeypatch):
+    _resume(cpdb)
+    _add_mission(cpdb, 4, "1942-01-04 10:00:00")
+
+    def failing_insert(*args, **kwargs):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(checker, "insert_promotion_events", failing_insert)
+    with pytest.raises(sqlite3.OperationalError):
+        _pass_with_checkpoint(cpdb, 4, "1942-01-04 10:00:00")
+    assert _resume(cpdb) == (3, "1942.01.03")
+
+
+def test_mismatched_checkpoint_reprimes(cpdb):
+    _resume(cpdb)
+    conn = sqlite3.connect(cpdb)
+    conn.execute("UPDATE mission SET date = '1943-06-01 10:00:00' WHERE id = 3")  # a different career
+    conn.commit()
+    conn.close()
+    assert _resume(cpdb) == (3, "1943.06.01")
@@ -0,0 +1,161 @@
+import os
+import random
+import sqlite3
+
+import pytest
+
+import rank_promotion_checker_light as checker
+from checkpoint import Checkpoint, mission_fingerprint
+from conftest import PLAYER_ID, attempts, build_cpdb, promotion_events, ranks
+from squadron_cache import SquadronCache
+from state_db import state_db_path
+
+DATE = "1942.01.04"
+
+
+class _Crash(Exception):
+    pass
+
+
+def _copy_db(src, dst):
+    a, b = sqlite3.connect(src), sqlite3.connect(dst)
+    try:
+        a.backup(b)
+    finally:
+        a.close()
+        b.close()
+
+
+def _run_pass(path):
+    conn = sqlite3.connect(path)
+    squadrons = SquadronCache()
+    squadrons.refresh(conn)
+    ctx = checker.PassContext(conn, checker.DEFAULT_THRESHOLDS, checker.DEFAULT_MAX_RANKS, "en", squadrons)
+    cp = Checkpoint(4, DATE, mission_fingerprint("1942-01-04 10:00:00", 1))
+    try:
+        checker.check_all_pilots_light(ctx, 1, DATE, checkpoint=cp)
+    finally:
+        conn.close()
+
+
+def _sidecar(path, sql):
+    conn = sqlite3.connect(state_db_path(path))
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def _final_state(path):
+    return (
+        ranks(path),
+        promotion_events(path),
+        attempts(path),
+        _sidecar(path, "SELECT missionId FROM checkpoint"),
+        _sidecar(path, "SELECT COUNT(*) FROM promotion_event_ledger"),
+        _sidecar(path, "SELECT * FROM pass_cursor"),
+        _sidecar(path, "SELECT * FROM pass_journal"),
+    )
+
+
+@pytest.fixture(autouse=True)
+def _small_chunks(monkeypatch):
+    monkeypatch.setattr(checker, "PASS_CHUNK_ROWS", 4)
+    monkeypatch.setattr(checker, "PASS_CHUNK_PAUSE", 0)
+    monkeypatch.setattr(random, "random", lambda: 0.0)
+
+
+@pytest.fixture
+def clean_state(tmp_path):
+    clean = build_cpdb(str(tmp_path / "clean" / "cp.db"))
+    _run_pass(clean)
+    return _final_state(clean)
+
+
+def test_pass_is_written_in_several_chunks(cpdb, monkeypatch):
+    calls = []
+    real_insert = checker.insert_promotion_events
+
+    def counting_insert(conn, events, commit=True):
+        calls.append(len(events))
+        return real_insert(conn, events, commit=commit)
+
+    monkeypatch.setattr(checker, "insert_promotion_events", counting_insert)
+    _run_pass(cpdb)
+    assert len(calls) > 2 and max(calls) <= 4
+    assert sum(calls) == len(promotion_events(cpdb))
+
+
+def test_failed_chunk_resumes_to_the_uninterrupted_result(cpdb, monkeypatch, clean_state):
+    # Call 1 is the player stage, then the AI chunks
+    real_insert = checker.insert_promotion_events
+    calls = []
+
+    def failing_third_chunk(conn, events, commit=True):
+        calls.append(events)
+        if len(calls) == 3:
+            raise sqlite3.OperationalError("disk I/O error")
+        return real_insert(conn, events, commit=commit)
+
+    monkeypatch.setattr(checker, "insert_promotion_events", failing_third_chunk)
+    with pytest.raises(sqlite3.OperationalError):
+        _run_pass(cpdb)
+    assert 0 < len(promotion_events(cpdb)) < len(clean_state[1])
+    cursor = _sidecar(cpdb, "SELECT lastPilotId FROM pass_cursor")
+    assert cursor == [(max(pid for pid, _, _ in calls[1]),)]
+    assert _sidecar(cpdb, "SELECT missionId FROM checkpoint") != [(4,)]
+
+    monkeypatch.setattr(checker, "insert_promotion_events", real_insert)
+    _run_pass(cpdb)
+    assert _final_state(cpdb) == clean_state
+
+
+def test_crash_after_a_chunk_lost_its_sidecar_commit_resumes(cpdb, monkeypatch, tmp_path, clean_state):
+    """AI chunk 2 reaches cp.db but not the sidecar, then the process dies."""
+    sidecar = state_db_path(cpdb)
+    snapshot = str(tmp_path / "sidecar_before_chunk_2.db")
+    real_journal = checker.journal_pass
+    calls = []
+
+    def journal(conn, pids):
+        calls.append(list(pids))
+        if len(calls) == 4:  # call 1 is the player stage
+            raise _Crash()
+        real_journal(conn, pids)
+        if len(calls) == 3:
+            _copy_db(sidecar, snapshot)
+
+    monkeypatch.setattr(checker, "journal_pass", journal)
+    with pytest.raises(_Crash):
+        _run_pass(cpdb)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(sidecar + suffix):
+            os.remove(sidecar + suffix)
+    _copy_db(snapshot, sidecar)
+    assert _sidecar(cpdb, "SELECT lastPilotId FROM pass_cursor") == [(max(calls[1]),)]
+
+    monkeypatch.setattr(checker, "journal_pass", real_journal)
+    _run_pass(cpdb)
+    assert _final_state(cpdb) == clean_state
+
+
+def test_player_is_committed_before_the_ai_backlog(cpdb, monkeypatch, clean_state):
+    real_insert = checker.insert_promotion_events
+    calls = []
+
+    def failing_ai_chunk(conn, events, commit=True):
+        calls.append(events)
+        if len(calls) == 2:
+            raise sqlite3.OperationalError("disk I/O error")
+        return real_insert(conn, events, commit=commit)
+
+    monkeypatch.setattr(checker, "insert_promotion_events", failing_ai_chunk)
+    with pytest.raises(sqlite3.OperationalError):
+        _run_pass(cpdb)
+    assert [pid for pid, _ in promotion_events(cpdb)] == [PLAYER_ID]
+    assert attempts(cpdb) == clean_state[2]
+    assert _sidecar(cpdb, "SELECT lastPilotId FROM pass_cursor") == [(0,)]
+
+    monkeypatch.setattr(checker, "insert_promotion_events", real_insert)
+    _run_pass(cpdb)
+    assert _final_state(cpdb) == clean_state
@@ -0,0 +1,41 @@
+import sqlite3
+
+from conftest import PLAYER_ID
+from eligibility import STAGED_PILOTS, remember_staged_pilots, stage_changed_pilots
+
+
+def _staged_ids(conn):
+    return {row[0] for row in conn.execute(f"SELECT id FROM {STAGED_PILOTS}")}
+
+
+def _remember(conn):
+    remember_staged_pilots(conn.cursor())
+    conn.commit()
+
+
+def test_only_changed_and_player_pilots_are_restaged(cpdb):
+    conn = sqlite3.connect(cpdb)
+    assert stage_changed_pilots(conn) == PLAYER_ID  # first pass: everyone
+    _remember(conn)
+
+    stage_changed_pilots(conn)
+    assert _staged_ids(conn) == {PLAYER_ID}
+
+    conn.execute("UPDATE pilot SET sorties = sorties + 1 WHERE id = 7")
+    conn.execute("UPDATE pilot SET squadronId = 3 WHERE id = 12")
+    conn.commit()
+    stage_changed_pilots(conn)
+    assert _staged_ids(conn) == {7, 12, PLAYER_ID}
+    conn.close()
+
+
+def test_unremembered_pass_is_staged_again(cpdb):
+    conn = sqlite3.connect(cpdb)
+    stage_changed_pilots(conn)
+    _remember(conn)
+    conn.execute("UPDATE pilot SET pcp = 999 WHERE id = 5")
+    conn.commit()
+    stage_changed_pilots(conn)  # pass rolled back: fingerprints not remembered
+    stage_changed_pilots(conn)
+    assert _staged_ids(conn) == {5, PLAYER_ID}
+    conn.close()
@@ -0,0 +1,42 @@
+import sqlite3
+
+from conftest import PLAYER_ID, attempts
+from maintenance import MaintenanceScheduler
+from state_db import attach_state_db, ATTEMPTS_TABLE, EVENT_LEDGER_TABLE, MAINTENANCE_TABLE
+
+
+def _seed(path):
+    """An orphaned attempt row and a ledger row whose event is gone; one personage below the cap."""
+    conn = sqlite3.connect(path)
+    attach_state_db(conn)
+    conn.executemany(f"INSERT INTO {ATTEMPTS_TABLE} (pilotId, last_success, fail_count) VALUES (?, 1, 0)",
+                     [(PLAYER_ID,), (999,)])
+    conn.execute(f"INSERT INTO {EVENT_LEDGER_TABLE} VALUES (1, 5, '1942-01-01 10:00:00', 12345)")
+    conn.execute("INSERT INTO personage VALUES (2, 13)")
+    conn.commit()
+    conn.close()
+
+
+def test_jobs_run_only_while_il2_is_closed_and_only_when_due(cpdb):
+    _seed(cpdb)
+    now, busy = [1.7e9], [True]
+    scheduler = MaintenanceScheduler(cpdb, is_busy=lambda: busy[0], clock=lambda: now[0])
+
+    assert scheduler.run_due() == 0
+    assert [row[0] for row in attempts(cpdb)] == [PLAYER_ID, 999]
+
+    busy[0] = False
+    assert scheduler.run_due() == 3
+    assert [row[0] for row in attempts(cpdb)] == [PLAYER_ID]
+    conn = sqlite3.connect(cpdb)
+    attach_state_db(conn)
+    assert conn.execute(f"SELECT COUNT(*) FROM {EVENT_LEDGER_TABLE}").fetchone()[0] == 0
+    assert conn.execute("SELECT id, maxRank FROM personage ORDER BY id").fetchall() == [(1, 13), (2, 13)]
+    assert dict(conn.execute(f"SELECT job, rows FROM {MAINTENANCE_TABLE}")) == {
+        "max_rank": 1, "orphans": 2, "optimize": 0}
+    conn.close()
+
+    now[0] += 3600  # only max_rank is due again, and nothing is below the cap
+    assert scheduler.run_due() == 1
+    # a new scheduler picks the last runs up from the state database
+    assert MaintenanceScheduler(cpdb, is_busy=lambda: False, clock=lambda: now[0]).run_due() == 0
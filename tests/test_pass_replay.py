@@ -0,0 +1,138 @@
+import os
+import random
+import sqlite3
+
+import pytest
+
+import rank_promotion_checker_light as checker
+from checkpoint import Checkpoint, mission_fingerprint
+from conftest import PLAYER_ID, attempts, build_cpdb, ranks, promotion_events
+from squadron_cache import SquadronCache
+from state_db import state_db_path
+
+DATE = "1942.01.04"  # canonical, as the monitor passes it
+
+
+def _copy_db(src, dst):
+    a, b = sqlite3.connect(src), sqlite3.connect(dst)
+    try:
+        a.backup(b)
+    finally:
+        a.close()
+        b.close()
+
+
+def _run_pass(path, date=DATE, mission_id=4):
+    conn = sqlite3.connect(path)
+    squadrons = SquadronCache()
+    squadrons.refresh(conn)
+    ctx = checker.PassContext(conn, checker.DEFAULT_THRESHOLDS, checker.DEFAULT_MAX_RANKS, "en", squadrons)
+    cp = Checkpoint(mission_id, date, mission_fingerprint("1942-01-04 10:00:00", 1))
+    try:
+        checker.check_all_pilots_light(ctx, 1, date, checkpoint=cp)
+    finally:
+        conn.close()
+
+
+class _Crash(Exception):
+    pass
+
+
+def _crashed_pass(path, monkeypatch, tmp_path, die_at=None):
+    """
+    Run a pass whose last transaction commits in cp.db while its sidecar half is lost. With
+    die_at=n the process dies at the n-th journal call instead (1 is the player stage).
+    """
+    sidecar = state_db_path(path)
+    snapshot = str(tmp_path / "sidecar_before_commit.db")
+    real_journal = checker.journal_pass
+    calls = []
+
+    def journal_then_snapshot(conn, pids):
+        calls.append(pids)
+        if len(calls) == die_at:
+            raise _Crash()
+        real_journal(conn, pids)
+        _copy_db(sidecar, snapshot)
+
+    monkeypatch.setattr(checker, "journal_pass", journal_then_snapshot)
+    try:
+        _run_pass(path)
+    except _Crash:
+        pass
+    monkeypatch.setattr(checker, "journal_pass", real_journal)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(sidecar + suffix):
+            os.remove(sidecar + suffix)
+    _copy_db(snapshot, sidecar)
+
+
+def _add_event(path, pid, rank, date):
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO event (date, type, pilotId, rankId, missionId, isDeleted) VALUES (?, 6, ?, ?, -1, 0)",
+                 (date, pid, rank))
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def rolls(monkeypatch):
+    values = []
+    monkeypatch.setattr(random, "random", lambda: values.pop(0))
+    return values
+
+
+def test_replay_after_lost_sidecar_commit_does_not_promote_twice(tmp_path, monkeypatch, rolls):
+    clean = build_cpdb(str(tmp_path / "clean" / "cp.db"))
+    rolls.append(0.0)
+    _run_pass(clean)
+
+    crashed = build_cpdb(str(tmp_path / "crashed" / "cp.db"))
+    rolls.append(0.0)
+    _crashed_pass(crashed, monkeypatch, tmp_path)
+    _run_pass(crashed)  # the player is skipped: no roll left to take
+
+    assert ranks(crashed) == ranks(clean)
+    assert promotion_events(crashed) == promotion_events(clean)
+    conn = sqlite3.connect(state_db_path(crashed))
+    assert conn.execute("SELECT COUNT(*) FROM pass_journal").fetchone()[0] == 0
+    assert conn.execute("SELECT missionId FROM checkpoint").fetchone() == (4,)
+    assert conn.execute("SELECT COUNT(*) FROM promotion_event_ledger").fetchone()[0] == len(promotion_events(crashed))
+    conn.close()
+
+
+def test_replayed_player_gets_no_fabricated_attempt_row(cpdb, monkeypatch, tmp_path, rolls):
+    rolls.append(0.0)
+    _crashed_pass(cpdb, monkeypatch, tmp_path, die_at=2)  # right after the player stage
+    assert attempts(cpdb) == []
+    promoted = ranks(cpdb)[PLAYER_ID]
+
+    _run_pass(cpdb)
+    assert ranks(cpdb)[PLAYER_ID] == promoted
+    assert attempts(cpdb) == []
+
+
+def test_foreign_event_on_the_pass_day_does_not_block_a_promotion(cpdb, rolls):
+    rank = ranks(cpdb)[5]
+    _add_event(cpdb, 5, rank, "1942.01.04 00:00:00")  # written by something else
+    rolls.append(0.0)
+    _run_pass(cpdb)
+    assert ranks(cpdb)[5] == rank + 1
+
+
+def test_replay_ignores_foreign_events_of_pilots_outside_the_pass(cpdb, monkeypatch, tmp_path, rolls):
+    conn = sqlite3.connect(cpdb)
+    conn.execute("UPDATE pilot SET pcp = 0 WHERE id = 5")  # not promoted, so not journaled
+    conn.commit()
+    conn.close()
+    rolls.append(0.0)
+    _crashed_pass(cpdb, monkeypatch, tmp_path)
+
+    rank = ranks(cpdb)[5]
+    _add_event(cpdb, 5, rank, "1942.01.04 00:00:00")
+    conn = sqlite3.connect(cpdb)
+    conn.execute("UPDATE pilot SET pcp = 1000 WHERE id = 5")
+    conn.commit()
+    conn.close()
+    _run_pass(cpdb)
+    assert ranks(cpdb)[5] == rank + 1
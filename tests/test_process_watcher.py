@@ -0,0 +1,82 @@
+from process_watcher import ProcessWatcher
+
+
+class FakeProvider:
+    """Scripted process table: 'procs' maps pid -> create_time of the running processes."""
+
+    def __init__(self):
+        self.procs = {}
+        self.scans = 0
+        self.alive_checks = []
+
+    def scan(self, name):
+        self.scans += 1
+        return min(self.procs.items()) if self.procs else None
+
+    def is_alive(self, pid, create_time):
+        self.alive_checks.append(pid)
+        return self.procs.get(pid) == create_time
+
+
+def test_found_process_is_pinned_and_not_rescanned():
+    provider = FakeProvider()
+    provider.procs[100] = 1.0
+    watcher = ProcessWatcher("il-2.exe", provider=provider)
+
+    assert watcher.is_running()
+    assert (watcher.pid, watcher.create_time) == (100, 1.0)
+    for _ in range(5):
+        assert watcher.is_running()
+    assert provider.scans == 1
+    assert provider.alive_checks == [100] * 5
+
+
+def test_exit_unpins_and_next_check_scans_again():
+    provider = FakeProvider()
+    provider.procs[100] = 1.0
+    watcher = ProcessWatcher("il-2.exe", provider=provider)
+    assert watcher.is_running()
+
+    del provider.procs[100]
+    assert not watcher.is_running()
+    assert watcher.pid is None
+    assert not watcher.is_running()
+    assert provider.scans == 2
+
+
+def test_reused_pid_with_new_create_time_is_not_the_pinned_process():
+    provider = FakeProvider()
+    provider.procs[100] = 1.0
+    watcher = ProcessWatcher("il-2.exe", provider=provider)
+    assert watcher.is_running()
+
+    provider.procs[100] = 2.0  # IL-2 exited and another process got its pid
+    assert not watcher.is_running()
+    assert watcher.pid is None
+
+    assert watcher.is_running()  # rescan pins the process that now owns the pid
+    assert (watcher.pid, watcher.create_time) == (100, 2.0)
+
+
+def test_scan_interval_backs_off_while_absent():
+    provider = FakeProvider()
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) == 6:
+            provider.procs[42] = 5.0
+
+    watcher = ProcessWatcher("il-2.exe", provider=provider, min_interval=1, max_interval=8, sleep=sleep)
+    assert watcher.wait_until_running() == 42
+    assert sleeps == [1, 2, 4, 8, 8, 8]
+    assert provider.scans == 7
+
+
+def test_wait_returns_at_once_when_running():
+    provider = FakeProvider()
+    provider.procs[7] = 3.0
+    sleeps = []
+    watcher = ProcessWatcher("il-2.exe", provider=provider, sleep=sleeps.append)
+    assert watcher.wait_until_running() == 7
+    assert sleeps == []
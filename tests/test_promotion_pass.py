@@ -0,0 +1,90 @@
+import random
+import sqlite3
+
+import pytest
+
+import rank_promotion_checker_light as checker
+from conftest import PLAYER_ID, attempts, build_cpdb, ranks, promotion_events
+from squadron_cache import SquadronCache
+
+DAYS = [("1942.01.01", 1, None), ("1942.01.02", 1, None), ("1942.01.03", 1, None), ("1942.01.05", 1, None)]
+
+
+def _context(conn):
+    squadrons = SquadronCache()
+    squadrons.refresh(conn)
+    return checker.PassContext(conn, checker.DEFAULT_THRESHOLDS, checker.DEFAULT_MAX_RANKS, "en", squadrons)
+
+
+def _run_pass(path, date="1942-01-03 10:00:00"):
+    conn = sqlite3.connect(path)
+    try:
+        checker.check_all_pilots_light(_context(conn), 1, date)
+    finally:
+        conn.close()
+
+
+def _state(path):
+    conn = sqlite3.connect(path)
+    try:
+        return (
+            ranks(path),
+            conn.execute("SELECT pilotId, rankId, date FROM event WHERE type=6 ORDER BY pilotId, date").fetchall(),
+            attempts(path),
+        )
+    finally:
+        conn.close()
+
+
+def _rolls(monkeypatch, values):
+    it = iter(values)
+    monkeypatch.setattr(random, "random", lambda: next(it))
+
+
+def test_pass_promotes_every_eligible_pilot_once(cpdb, monkeypatch):
+    _rolls(monkeypatch, [0.0])
+    before = ranks(cpdb)
+    _run_pass(cpdb)
+    after = ranks(cpdb)
+    assert all(after[pid] == rank + 1 for pid, rank in before.items())
+    assert sorted(promotion_events(cpdb)) == sorted((pid, rank) for pid, rank in after.items())
+    assert [(pid, ok, fails) for pid, _, ok, fails in attempts(cpdb)] == [(PLAYER_ID, 1, 0)]
+
+
+def test_failure_mid_pass_rolls_back_the_whole_pass(cpdb, monkeypatch):
+    _rolls(monkeypatch, [0.0])
+    real_insert = checker.insert_promotion_events
+
+    def failing_insert(*args, **kwargs):
+        real_insert(*args, **kwargs)  # the events are written, then the pass fails
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(checker, "insert_promotion_events", failing_insert)
+    before = ranks(cpdb)
+    with pytest.raises(sqlite3.OperationalError):
+        _run_pass(cpdb)
+    assert ranks(cpdb) == before
+    assert promotion_events(cpdb) == []
+    assert attempts(cpdb) == []
+
+
+def test_coalesced_backlog_matches_day_by_day_passes(tmp_path, monkeypatch):
+    # Player: fails day 1, cooldown day 2, fails day 3, promoted day 5
+    rolls = [0.99, 0.99, 0.0]
+
+    stepped = build_cpdb(str(tmp_path / "stepped" / "cp.db"))
+    _rolls(monkeypatch, rolls)
+    conn = sqlite3.connect(stepped)
+    ctx = _context(conn)
+    for date, squadron, _ in DAYS:
+        checker.check_all_pilots_light(ctx, squadron, date)
+    conn.close()
+
+    coalesced = build_cpdb(str(tmp_path / "coalesced" / "cp.db"))
+    _rolls(monkeypatch, rolls)
+    conn = sqlite3.connect(coalesced)
+    checker.check_backlog_light(_context(conn), DAYS)
+    conn.close()
+
+    assert _state(coalesced) == _state(stepped)
+    assert ranks(coalesced)[PLAYER_ID] == 6
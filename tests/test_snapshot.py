@@ -0,0 +1,56 @@
+import random
+import sqlite3
+
+import rank_promotion_checker_light as checker
+from conftest import PLAYER_ID, attempts, build_cpdb, ranks, promotion_events
+from db import EvaluationSnapshot
+from squadron_cache import SquadronCache
+
+
+def _run_pass(path, snapshot=None, date="1942-01-03 10:00:00"):
+    conn = sqlite3.connect(path)
+    try:
+        squadrons = SquadronCache()
+        squadrons.refresh(conn)
+        ctx = checker.PassContext(conn, checker.DEFAULT_THRESHOLDS, checker.DEFAULT_MAX_RANKS, "en", squadrons,
+                                  snapshot=snapshot)
+        checker.check_all_pilots_light(ctx, 1, date)
+    finally:
+        conn.close()
+
+
+def test_snapshot_pass_matches_a_live_pass(tmp_path, monkeypatch):
+    monkeypatch.setattr(random, "random", lambda: 0.0)
+    live = build_cpdb(str(tmp_path / "live" / "cp.db"))
+    _run_pass(live)
+
+    snapped = build_cpdb(str(tmp_path / "snapped" / "cp.db"))
+    snapshot = EvaluationSnapshot(snapped)
+    try:
+        _run_pass(snapped, snapshot)
+    finally:
+        snapshot.close()
+    assert ranks(snapped) == ranks(live)
+    assert sorted(promotion_events(snapped)) == sorted(promotion_events(live))
+    assert [row[:1] + row[2:] for row in attempts(snapped)] == [row[:1] + row[2:] for row in attempts(live)]
+    assert attempts(snapped)[0][0] == PLAYER_ID
+
+
+def test_snapshot_copies_only_the_active_squadrons_latest_mission(cpdb):
+    conn = sqlite3.connect(cpdb)
+    conn.execute("INSERT INTO mission VALUES (4, '1942-01-04 10:00:00', 2)")
+    conn.execute("INSERT INTO pilot (id, squadronId, personageId, isDeleted, rankId) VALUES (99, 2, 'p2', 0, 5)")
+    conn.executemany("INSERT INTO event (type, pilotId, missionId, isDeleted) VALUES (1, ?, ?, 0)",
+                     [(99, 4), (1, 3)])  # another squadron's player; an AI pilot on the latest mission
+    conn.commit()
+    conn.close()
+
+    snapshot = EvaluationSnapshot(cpdb)
+    try:
+        snap = snapshot.refresh([1])
+        assert snap.execute("SELECT missionId, pilotId FROM event").fetchall() == [(3, PLAYER_ID)]
+        assert snapshot.refresh([]).execute("SELECT COUNT(*) FROM event").fetchone()[0] == 0
+        assert sorted(snapshot.refresh([1, 2]).execute("SELECT missionId, pilotId FROM event")) == [
+            (3, PLAYER_ID), (4, 99)]
+    finally:
+        snapshot.close()